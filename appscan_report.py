@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+import json
+import sys
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+# Groups of the AppScan XML report that issue items reference by id
+LOOKUP_GROUPS = {
+    "issue-type-group": "issue_types",
+    "url-group": "urls",
+    "entity-group": "entities",
+}
+
+# Finding field: (lookup table its refs point into, tags it is read from).
+# Ids are only unique within a group, so a ref is resolved in its own table.
+FINDING_FIELDS = {
+    "issue_type": ("issue_types", ("issue-type", "issue-type-name")),
+    "severity": (None, ("severity",)),
+    "url": ("urls", ("url", "location")),
+    "parameter": ("entities", ("parameter", "entity-name")),
+    "cwe": (None, ("cwe",)),
+    "entity": ("entities", ("entity",)),
+}
+
+def iter_findings(source):
+    # Streams the issue-group of an AppScan XML report and yields one flat
+    # finding dict per issue. Every group item is removed from the tree once
+    # it has been handled, so memory stays flat whatever the report size.
+    # Fields given as <ref> ids are resolved through the issue-type, url and
+    # entity groups seen earlier in the document; refs that cannot be
+    # resolved are returned as-is.
+    lookups = {name: {} for name in LOOKUP_GROUPS.values()}
+    stack = []
+
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        group = parent.tag if parent is not None else None
+
+        if elem.tag == "item" and group == "issue-group":
+            yield _finding(elem, lookups)
+        elif elem.tag == "item" and group in LOOKUP_GROUPS:
+            _remember(elem, lookups[LOOKUP_GROUPS[group]])
+        elif len(stack) > 2:
+            # Nested in a group item, dropped together with that item
+            continue
+
+        elem.clear()
+        if parent is not None:
+            parent.remove(elem)
+
+def _remember(item, table):
+    item_id = item.get("id")
+    if item_id is None:
+        return
+    entry = {child.tag: (child.text or "").strip() for child in item if len(child) == 0}
+    table[item_id] = entry
+
+def _finding(item, lookups):
+    finding = {"id": item.get("id")}
+    for field, (table, tags) in FINDING_FIELDS.items():
+        finding[field] = None
+        for tag in tags:
+            child = item.find(tag)
+            if child is not None:
+                finding[field] = _value(child, lookups.get(table, {}))
+                break
+
+    entity = lookups["entities"].get(_ref(item.find("entity")) or "", {})
+    if finding["parameter"] is None and entity.get("entity-type", entity.get("type")) == "Parameter":
+        finding["parameter"] = finding["entity"]
+
+    if finding["cwe"] is None:
+        issue_type = lookups["issue_types"].get(_ref(item.find("issue-type")) or "", {})
+        finding["cwe"] = issue_type.get("cwe") or None
+    return finding
+
+def _ref(elem):
+    if elem is None:
+        return None
+    ref = elem.find("ref")
+    return ref.text.strip() if ref is not None and ref.text else None
+
+def _value(elem, table):
+    ref = _ref(elem)
+    if ref is None:
+        text = (elem.text or "").strip()
+        return text or None
+
+    entry = table.get(ref)
+    if entry is None:
+        return ref
+    return entry.get("name") or entry.get("url") or ref
+
+def start_tag(elem):
+    # Opening tag of elem with its attributes, for writing a report out
+    # element by element
+    attributes = "".join(f" {name}={quoteattr(value)}" for name, value in elem.attrib.items())
+    return f"<{elem.tag}{attributes}>\n".encode()
+
+def main():
+    if len(sys.argv) != 2:
+        print("\nUsage: python appscan_report.py <report.xml>\n")
+        sys.exit(1)
+
+    for finding in iter_findings(sys.argv[1]):
+        print(json.dumps(finding))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+
+# One entry point for the scan, report and DefectDojo tools. Only argparse
+# (and report_profiles, for the profile choices) is loaded up front: each
+# subcommand imports the modules it needs (and with them requests) when it
+# runs, so --help and argument errors return without that import cost.
+
+def cmd_scan(args):
+    from dd1 import SCAN_MODE, get_token, run_single_scan
+    from report_profiles import REPORT_PROFILE
+
+    token = get_token(args.api_key, args.api_secret)
+    run_single_scan(token, args.app_id, args.target_url, args.scan_name, args.mode or SCAN_MODE,
+                    args.report_profile or REPORT_PROFILE, args.presence_id, args.timeout, args.progress)
+
+def cmd_status(args):
+    from dd1 import get_scan_status, get_token
+
+    token = get_token(args.api_key, args.api_secret)
+    status_obj = get_scan_status(token, args.scan_id)
+    if status_obj is None:
+        sys.exit(1)
+    print(json.dumps(status_obj))
+
+def cmd_report(args):
+    from dd1 import generate_report, get_token
+    from report_profiles import REPORT_PROFILE
+
+    token = get_token(args.api_key, args.api_secret)
+    report_data = generate_report(token, args.scan_id, args.profile or REPORT_PROFILE)
+    print(report_data["Id"])
+
+def cmd_download(args):
+    from dd1 import download_report_to_file, get_token
+
+    token = get_token(args.api_key, args.api_secret)
+    report = download_report_to_file(token, args.report_id, args.output or f"{args.report_id}_report.xml", args.sha256)
+    print(f"Report downloaded as {report['path']} ({report['size']} bytes, sha256 {report['sha256']})")
+
+def cmd_import(args):
+    from bulk_import import DEFAULT_SCAN_TYPE, bulk_import, literal_name
+    from defectdojo import CHUNK_ISSUES, CHUNK_MB
+    from findings_dedupe import DEDUPE_SCOPE
+
+    records = bulk_import(args.token, args.url, args.file, [], literal_name(args.product), literal_name(args.engagement),
+                          args.scan_type or DEFAULT_SCAN_TYPE, skip_unchanged=not args.force,
+                          dedupe=args.dedupe or DEDUPE_SCOPE, chunk_issues=args.chunk_issues or CHUNK_ISSUES,
+                          chunk_mb=args.chunk_mb or CHUNK_MB)
+    if any(r["error"] for r in records):
+        sys.exit(1)
+
+def add_asoc_credentials(parser):
+    parser.add_argument("api_key", help="ASoC API Key")
+    parser.add_argument("api_secret", help="ASoC API Secret")
+
+def build_parser():
+    from report_profiles import REPORT_PROFILES
+
+    parser = argparse.ArgumentParser(prog="asoc", description="AppScan on Cloud DAST scans and DefectDojo imports")
+    subparsers = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    scan = subparsers.add_parser("scan", help="Start a DAST scan, wait for it and download its report")
+    add_asoc_credentials(scan)
+    scan.add_argument("app_id", help="ASoC application id")
+    scan.add_argument("target_url", help="Starting URL of the scan")
+    scan.add_argument("scan_name", help="Scan name; the report is saved as <scan_name>_report.xml")
+    # dd1.SCAN_MODES, spelled out so parsing does not import dd1
+    scan.add_argument("--mode", choices=("full", "incremental", "auto"), help="(default: ASOC_SCAN_MODE or full)")
+    scan.add_argument("--report-profile", choices=tuple(REPORT_PROFILES), help="(default: ASOC_REPORT_PROFILE or audit)")
+    scan.add_argument("--presence-id", help="AppScan Presence used to reach the target")
+    scan.add_argument("--timeout", type=int, help="Seconds to wait for the scan "
+                      "(default: from the app's past scan durations, or 30 minutes without history)")
+    scan.add_argument("--progress", action="store_true", help="Show a progress bar while waiting (needs tqdm)")
+    scan.set_defaults(func=cmd_scan)
+
+    status = subparsers.add_parser("status", help="Print the status of a scan as JSON")
+    add_asoc_credentials(status)
+    status.add_argument("scan_id", help="Scan id")
+    status.set_defaults(func=cmd_status)
+
+    report = subparsers.add_parser("report", help="Generate a report for a scan and print its id")
+    add_asoc_credentials(report)
+    report.add_argument("scan_id", help="Scan id")
+    report.add_argument("--profile", choices=tuple(REPORT_PROFILES), help="(default: ASOC_REPORT_PROFILE or audit)")
+    report.set_defaults(func=cmd_report)
+
+    download = subparsers.add_parser("download", help="Download a generated report")
+    add_asoc_credentials(download)
+    download.add_argument("report_id", help="Report id")
+    download.add_argument("-o", "--output", help="File to write (default: <report_id>_report.xml)")
+    download.add_argument("--sha256", help="Fail unless the report has this checksum")
+    download.set_defaults(func=cmd_download)
+
+    imp = subparsers.add_parser("import", help="Import reports into a DefectDojo product and engagement")
+    imp.add_argument("url", help="DefectDojo URL")
+    imp.add_argument("token", help="DefectDojo Authorization Token")
+    imp.add_argument("product", help="Product name, created if missing (bulk_import.py takes {name} templates)")
+    imp.add_argument("engagement", help="Engagement name")
+    imp.add_argument("file", nargs="+", help="Scan report files")
+    imp.add_argument("--scan-type", help="DefectDojo scan type (default: HCLAppScan XML DAST)")
+    imp.add_argument("--force", action="store_true", help="Upload reports even if their findings are unchanged")
+    imp.add_argument("--dedupe", choices=("off", "product", "global"),
+                     help="Leave out findings uploaded to the product or to any product within DOJO_FINDING_TTL_DAYS (30); "
+                          "closed findings stay left out until then (default: DOJO_DEDUPE or off)")
+    imp.add_argument("--chunk-issues", type=int, help="Import reports with more issues than this in parallel chunks (default: DOJO_CHUNK_ISSUES)")
+    imp.add_argument("--chunk-mb", type=float, help="Import reports with more megabytes of issues than this in parallel chunks (default: DOJO_CHUNK_MB)")
+    imp.set_defaults(func=cmd_import)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import get_metrics, timed_request
+from rate_limiter import MAX_RETRIES, RETRY_STATUSES, get_rate_limiter, retry_delay
+
+# Base URL of the ASoC REST API
+BASE_API_URL = os.environ.get("ASOC_BASE_URL", "https://cloud.appscan.com/api/v2").rstrip("/")
+
+DEFAULT_POOL_SIZE = int(os.environ.get("ASOC_POOL_SIZE", "10"))
+DEFAULT_TIMEOUT = (
+    float(os.environ.get("ASOC_CONNECT_TIMEOUT", "10")),
+    float(os.environ.get("ASOC_READ_TIMEOUT", "120")),
+)
+
+class ASoCClient:
+    # One pooled keep-alive session per client, so repeated polls and
+    # download retries reuse the same TCP+TLS connection to cloud.appscan.com.
+    def __init__(self, base_url=BASE_API_URL, token=None, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"accept": "application/json"})
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, token=None, **kwargs):
+        headers = dict(kwargs.pop("headers", None) or {})
+        token = token or self.token
+        if token and _token_provider is not None:
+            token = _token_provider.current(token)
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        kwargs.setdefault("timeout", self.timeout)
+        response = self._send(method, path, headers, kwargs)
+
+        if response.status_code == 401 and token and _token_provider is not None:
+            # Token expired or was revoked: log in again and retry once
+            new_token = _token_provider.refresh(token)
+            if new_token:
+                response.close()
+                get_metrics().count_retry("asoc", "unauthorized")
+                headers["Authorization"] = f"Bearer {new_token}"
+                response = self._send(method, path, headers, kwargs)
+        return response
+
+    def _send(self, method, path, headers, kwargs):
+        # Every call waits for the shared rate limiter. Throttled (429) and
+        # unavailable (503) responses are retried after their Retry-After, or
+        # a jittered backoff, during which the limiter holds back all callers.
+        limiter = get_rate_limiter()
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.acquire()
+            response = timed_request("asoc", self.session, method, self.url(path), headers=headers, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            delay = retry_delay(response, attempt)
+            response.close()
+            get_metrics().count_retry("asoc", "throttled" if response.status_code == 429 else "unavailable")
+            print(f"ASoC returned {response.status_code} for {method} {path}, retrying in {delay:.1f}s")
+            limiter.block_for(delay)
+
+    def get(self, path, token=None, **kwargs):
+        return self.request("GET", path, token=token, **kwargs)
+
+    def post(self, path, token=None, **kwargs):
+        return self.request("POST", path, token=token, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+_token_provider = None
+
+def get_client():
+    # Shared client used by all the module-level ASoC functions
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ASoCClient()
+    return _client
+
+def set_client(client):
+    global _client
+    with _client_lock:
+        _client = client
+
+def set_token_provider(provider):
+    # provider.current(token) returns the token to send in place of token;
+    # provider.refresh(token) returns a replacement after a 401, or None
+    global _token_provider
+    _token_provider = provider
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asoc_client import ASoCClient, set_client
+from dd1 import (FULL_SCAN_INTERVAL, SCAN_MODE, SCAN_MODE_FULL, SCAN_MODES, get_token, start_scheduled_scan,
+                 generate_report, download_report_to_file)
+from job_store import PHASE_POLLING, PHASE_GENERATING, PHASE_DOWNLOADING, PHASE_DONE, PHASE_FAILED, get_job_store
+from report_profiles import REPORT_PROFILE, REPORT_PROFILES
+from scan_poller import ScanPoller
+from scan_schedule import expected_duration, scan_duration, scan_timeout
+
+MANIFEST_FIELDS = ("app_id", "target_url", "scan_name")
+
+def load_manifest(path):
+    # Manifest is either a CSV with an app_id,target_url,scan_name header
+    # or a JSON list of objects with the same keys.
+    with open(path, newline="") as f:
+        if path.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = list(csv.DictReader(f))
+
+    for i, entry in enumerate(entries):
+        missing = [k for k in MANIFEST_FIELDS if not entry.get(k)]
+        if missing:
+            raise ValueError(f"Manifest entry {i} is missing {', '.join(missing)}")
+    return entries
+
+def new_record(entry):
+    return {
+        "app_id": entry["app_id"],
+        "target_url": entry["target_url"],
+        "scan_name": entry["scan_name"],
+        "scan_id": None,
+        "job_id": None,
+        "status": None,
+        "high": None,
+        "medium": None,
+        "low": None,
+        "report_id": None,
+        "report_path": None,
+        "incremental": False,
+        "report_profile": entry.get("report_profile") or REPORT_PROFILE,
+        "error": None,
+        "started": time.time(),
+        "scan_started": None,
+        "resumed": False,
+    }
+
+def run_scan(token, entry, poller, output_dir=".", max_time=None, store=None, mode=SCAN_MODE_FULL, full_interval=FULL_SCAN_INTERVAL,
+             report_profile=REPORT_PROFILE):
+    record = new_record(entry)
+    record["report_profile"] = entry.get("report_profile") or report_profile
+    record["report_path"] = os.path.join(output_dir, f"{entry['scan_name']}_report.xml")
+    try:
+        scan_id, record["incremental"] = start_scheduled_scan(
+            token, entry["app_id"], entry["target_url"], entry["scan_name"], entry.get("mode") or mode, full_interval, store)
+    except SystemExit:
+        # The dd1 helpers print the error and exit; keep the rest of the batch going
+        record["error"] = "Request failed"
+        return finish_record(record)
+
+    record["scan_id"] = scan_id
+    record["scan_started"] = time.time()
+    print(f"[{entry['scan_name']}] DAST scan started. Scan ID: {scan_id}")
+    if store is not None:
+        record["job_id"] = store.add(scan_id, entry["app_id"], entry["target_url"], entry["scan_name"], record["report_path"],
+                                     record["incremental"])
+    return continue_scan(token, record, poller, PHASE_POLLING, max_time, store)
+
+def continue_scan(token, record, poller, phase=PHASE_POLLING, max_time=None, store=None):
+    # Runs the remaining phases of a started scan. The job store is updated
+    # as each phase completes; a failure or timeout leaves the job at its
+    # phase so that resume.py can pick it up again. Without a max_time the
+    # timeout comes from the app's past scan durations.
+    scan_id = record["scan_id"]
+
+    def advance(phase, **fields):
+        if store is not None:
+            store.update(record["job_id"], phase, **fields)
+
+    try:
+        if phase == PHASE_POLLING:
+            eta = expected_duration(store, record["app_id"], record["incremental"])
+            if max_time is None:
+                max_time = scan_timeout(store, record["app_id"], record["incremental"])
+            status_obj = poller.wait(scan_id, timeout=max_time, eta=eta, started=record["scan_started"])
+            if status_obj is None:
+                record["status"] = "TimedOut"
+                record["error"] = f"Scan timed out after {max_time / 60:.0f} minutes."
+                return finish_record(record)
+
+            record["status"] = status_obj["Status"]
+            if status_obj["Status"] != "Completed":
+                record["error"] = status_obj["ErrorMessage"]
+                advance(PHASE_FAILED, error=record["error"])
+                return finish_record(record)
+
+            record["high"] = status_obj["HighVulnerabilities"]
+            record["medium"] = status_obj["MediumVulnerabilities"]
+            record["low"] = status_obj["LowVulnerabilities"]
+            if store is not None:
+                # A resumed job's scan may have finished long before this
+                # wait; its time since the start is only its duration when
+                # the poller saw it still running
+                live = status_obj["SeenRunning"] or not record["resumed"]
+                duration = scan_duration(status_obj, record["scan_started"], live)
+                if duration is not None:
+                    store.record_duration(record["app_id"], record["incremental"], duration)
+                if not record["incremental"]:
+                    store.set_baseline(record["app_id"], scan_id, record["target_url"])
+            phase = PHASE_GENERATING
+            advance(phase)
+
+        if phase == PHASE_GENERATING:
+            record["report_id"] = generate_report(token, scan_id, record["report_profile"])["Id"]
+            phase = PHASE_DOWNLOADING
+            advance(phase, report_id=record["report_id"])
+
+        if phase == PHASE_DOWNLOADING:
+            report = download_report_to_file(token, record["report_id"], record["report_path"],
+                                             history_key=record["app_id"], profile=record["report_profile"])
+            record["report_path"] = report["path"]
+            record["report_size"] = report["size"]
+            record["report_sha256"] = report["sha256"]
+            advance(PHASE_DONE)
+    except SystemExit:
+        record["error"] = record["error"] or "Request failed"
+    except Exception as e:
+        record["error"] = str(e)
+
+    return finish_record(record)
+
+def finish_record(record):
+    record["finished"] = time.time()
+    record["duration"] = round(record["finished"] - record["started"], 3)
+    print(f"[{record['scan_name']}] finished with status {record['status']} in {record['duration']}s")
+    return record
+
+def run_batch(token, entries, results_path, workers=10, output_dir=".", max_time=None, poll_interval=30, store=None,
+              mode=SCAN_MODE_FULL, full_interval=FULL_SCAN_INTERVAL, report_profile=REPORT_PROFILE):
+    records = []
+    # A single poller refreshes every in-flight scan per tick instead of each
+    # worker polling its own scan
+    poller = ScanPoller(token, interval=poll_interval, workers=workers)
+
+    with open(results_path, "a") as results, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_scan, token, entry, poller, output_dir, max_time, store, mode, full_interval, report_profile)
+                   for entry in entries]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+
+    poller.stop()
+    print(f"Status polling used {poller.requests} requests")
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many AppScan DAST scans concurrently from a manifest")
+    parser.add_argument("api_key", help="ASoC API Key")
+    parser.add_argument("api_secret", help="ASoC API Secret")
+    parser.add_argument("manifest", help="CSV or JSON manifest with app_id, target_url and scan_name")
+    parser.add_argument("--workers", type=int, default=10, help="Maximum number of scans in flight")
+    parser.add_argument("--results", default="batch_results.jsonl", help="File the per-scan result records are appended to")
+    parser.add_argument("--output-dir", default=".", help="Directory the downloaded reports are written to")
+    parser.add_argument("--timeout", type=int, help="Per-scan timeout in seconds "
+                        "(default: from the app's past scan durations, or 30 minutes without history)")
+    parser.add_argument("--poll-interval", type=int, default=30, help="Seconds between status checks")
+    parser.add_argument("--mode", choices=SCAN_MODES, default=SCAN_MODE, help="full scans, incremental executions of each app's baseline, "
+                        "or auto: incremental until the baseline is older than --full-every (a manifest mode column overrides this)")
+    parser.add_argument("--full-every", type=float, default=FULL_SCAN_INTERVAL / 86400, help="Days between full scans in auto mode")
+    parser.add_argument("--report-profile", choices=REPORT_PROFILES, default=REPORT_PROFILE, help="Report sections to generate: "
+                        "audit (all), import (what DefectDojo needs) or summary (a manifest report_profile column overrides this)")
+    args = parser.parse_args()
+
+    entries = load_manifest(args.manifest)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # One pooled connection per worker so concurrent polls never queue on the pool
+    set_client(ASoCClient(pool_size=args.workers))
+
+    token = get_token(args.api_key, args.api_secret)
+
+    start = time.time()
+    records = run_batch(token, entries, args.results, args.workers, args.output_dir, args.timeout, args.poll_interval,
+                        get_job_store(), args.mode, args.full_every * 86400, args.report_profile)
+    failed = [r for r in records if r["error"]]
+
+    print(f"{len(records)} scans finished in {time.time() - start:.1f}s, {len(failed)} failed. Results written to {args.results}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
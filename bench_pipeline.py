@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from mock_services import MockServer, add_mock_arguments, mock_options
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Metrics compared against a baseline run; all are lower-is-better
+COMPARED_METRICS = ("seconds", "requests", "peak_rss_mb")
+
+def write_manifest(path, scans):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("app_id", "target_url", "scan_name"))
+        for i in range(scans):
+            writer.writerow((f"app{i}", f"https://app{i}.example.com", f"bench{i}"))
+
+def tool_command(tool, url, manifest, scans, work_dir, poll_interval):
+    if tool == "pipeline":
+        return [sys.executable, os.path.join(HERE, "pipeline.py"), "bench-key", "bench-secret", url, "bench-token", manifest,
+                "--max-scans", str(scans), "--poll-interval", str(poll_interval), "--force",
+                "--results", os.path.join(work_dir, "results.jsonl")]
+    return [sys.executable, os.path.join(HERE, "batch_scan.py"), "bench-key", "bench-secret", manifest,
+            "--workers", str(scans), "--poll-interval", str(poll_interval),
+            "--output-dir", os.path.join(work_dir, "reports"), "--results", os.path.join(work_dir, "results.jsonl")]
+
+def mock_stats(url, reset=False):
+    with urllib.request.urlopen(url + ("/_mock/reset" if reset else "/_mock/stats")) as response:
+        return json.load(response)
+
+def run_case(server, tool, scans, poll_interval, timeout):
+    # Each case runs the real script in a child process against the mock, with
+    # its own caches and job store, so RSS and requests are those of one run
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        manifest = os.path.join(work_dir, "manifest.csv")
+        write_manifest(manifest, scans)
+        env = dict(
+            os.environ,
+            ASOC_BASE_URL=f"{server.url}/api/v2",
+            ASOC_TOKEN_CACHE=os.path.join(work_dir, "token.json"),
+            ASOC_JOB_STORE=os.path.join(work_dir, "jobs.sqlite3"),
+            DOJO_PRODUCT_CACHE=os.path.join(work_dir, "products.json"),
+            DOJO_IMPORT_CACHE=os.path.join(work_dir, "imports.json"),
+            ASOC_REPORT_HISTORY=os.path.join(work_dir, "report_history.json"),
+        )
+        mock_stats(server.url, reset=True)
+        log_path = os.path.join(work_dir, "output.log")
+        with open(log_path, "w") as log:
+            start = time.time()
+            proc = subprocess.Popen(tool_command(tool, server.url, manifest, scans, work_dir, poll_interval),
+                                    stdout=log, stderr=subprocess.STDOUT, env=env, cwd=work_dir)
+            # wait4 gives the resource usage of this child alone
+            deadline = start + timeout
+            while True:
+                pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid:
+                    break
+                if time.time() > deadline:
+                    proc.kill()
+                    pid, status, usage = os.wait4(proc.pid, 0)
+                    break
+                time.sleep(0.05)
+            elapsed = time.time() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        stats = mock_stats(server.url)
+        with open(log_path) as f:
+            tail = f.read()[-2000:]
+        completed = 0
+        results_path = os.path.join(work_dir, "results.jsonl")
+        if os.path.exists(results_path):
+            with open(results_path) as f:
+                completed = sum(1 for line in f if not json.loads(line)["error"])
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        return {
+            "tool": tool,
+            "scans": scans,
+            "completed": completed,
+            "exit_code": proc.returncode,
+            "seconds": round(elapsed, 3),
+            "requests": stats["requests"],
+            "endpoints": stats["endpoints"],
+            "injected_errors": stats["errors"],
+            "bytes_in": stats["bytes_in"],
+            "bytes_out": stats["bytes_out"],
+            "peak_rss_mb": round(rss_mb, 1),
+            "scans_per_minute": round(completed / elapsed * 60, 1),
+            "output": tail if proc.returncode else None,
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def load_baseline(path):
+    baseline = {}
+    with open(path) as f:
+        for line in f:
+            result = json.loads(line)
+            baseline[(result["tool"], result["scans"])] = result
+    return baseline
+
+def regressions(result, baseline, tolerance):
+    previous = baseline.get((result["tool"], result["scans"]))
+    if previous is None:
+        return []
+    found = []
+    for metric in COMPARED_METRICS:
+        if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+            found.append(f"{metric} {previous[metric]} -> {result[metric]}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scan scripts end to end against the local mock services")
+    parser.add_argument("--tool", choices=("pipeline", "batch"), default="pipeline",
+                        help="pipeline.py (scan to DefectDojo import) or batch_scan.py (scan and download)")
+    parser.add_argument("--scans", type=int, nargs="+", default=[1, 10, 100], help="Concurrent scan counts to run")
+    parser.add_argument("--poll-interval", type=int, default=1, help="Status poll interval passed to the script")
+    parser.add_argument("--timeout", type=int, default=600, help="Seconds before a run is killed")
+    parser.add_argument("--results", help="File the per-run measurements are appended to as JSON lines")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional increase over the baseline")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+    server = MockServer(**mock_options(args)).start()
+    print(f"Mock services on {server.url}")
+
+    failed = False
+    print(f"{'scans':>6} {'done':>6} {'seconds':>8} {'requests':>9} {'rss MB':>7} {'scans/min':>10}  regressions")
+    try:
+        for scans in args.scans:
+            result = run_case(server, args.tool, scans, args.poll_interval, args.timeout)
+            found = regressions(result, baseline, args.tolerance)
+            failed = failed or bool(found) or result["exit_code"] != 0
+            print(f"{scans:>6} {result['completed']:>6} {result['seconds']:>8.1f} {result['requests']:>9} "
+                  f"{result['peak_rss_mb']:>7.1f} {result['scans_per_minute']:>10.1f}  {', '.join(found) or '-'}")
+            if result["output"]:
+                print(f"{args.tool} exited with {result['exit_code']}:\n{result['output']}")
+            if args.results:
+                with open(args.results, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
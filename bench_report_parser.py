@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+from appscan_report import iter_findings
+
+SEVERITIES = ("High", "Medium", "Low", "Informational")
+ISSUE_TYPES = (
+    ("attCrossSiteScripting", "Cross-Site Scripting", "79"),
+    ("attBlindSqlInjection", "Blind SQL Injection", "89"),
+    ("attDirectoryFound", "Hidden Directory Detected", "200"),
+    ("attCsrf", "Cross-Site Request Forgery", "352"),
+)
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def write_synthetic_report(path, size_mb, urls=1000):
+    # Writes an AppScan-style XML report of roughly size_mb, padded with
+    # request/response traffic the way full-detail reports are.
+    target = size_mb * 1024 * 1024
+    traffic = "GET /search?q=%3Cscript%3E HTTP/1.1\nHost: example.com\n" + "X-Padding: " + "a" * 2000 + "\n"
+    count = 0
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<xml-report name="synthetic" xmlExportVersion="2.5">\n')
+        f.write("<issue-type-group>\n")
+        for type_id, name, cwe in ISSUE_TYPES:
+            f.write(f'<item id="{type_id}"><name>{name}</name><cwe>{cwe}</cwe></item>\n')
+        f.write("</issue-type-group>\n<url-group>\n")
+        for i in range(urls):
+            f.write(f'<item id="url{i}"><name>https://example.com/app/page{i}</name></item>\n')
+        f.write("</url-group>\n<entity-group>\n")
+        for i in range(urls):
+            f.write(f'<item id="ent{i}"><name>param{i}</name><entity-type>Parameter</entity-type></item>\n')
+        f.write("</entity-group>\n<issue-group>\n")
+        while f.tell() < target:
+            type_id = ISSUE_TYPES[count % len(ISSUE_TYPES)][0]
+            f.write(
+                f'<item id="issue{count}"><issue-type><ref>{type_id}</ref></issue-type>'
+                f"<severity>{SEVERITIES[count % len(SEVERITIES)]}</severity>"
+                f"<url><ref>url{count % urls}</ref></url><entity><ref>ent{count % urls}</ref></entity>"
+                f"<variant-group><item><test-http-traffic>{traffic}</test-http-traffic></item></variant-group></item>\n"
+            )
+            count += 1
+        f.write("</issue-group>\n</xml-report>\n")
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming AppScan XML report parser")
+    parser.add_argument("--size-mb", type=int, default=2048, help="Size of the synthetic report")
+    parser.add_argument("--report", help="Existing report to parse instead of a synthetic one")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic report afterwards")
+    args = parser.parse_args()
+
+    path = args.report
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix="_report.xml")
+        os.close(fd)
+        start = time.time()
+        issues = write_synthetic_report(path, args.size_mb)
+        print(f"Generated {issues} issues in {time.time() - start:.1f}s at {path}")
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    baseline_rss = current_rss_mb()
+    samples = []
+    count = 0
+    start = time.time()
+    try:
+        for _ in iter_findings(path):
+            count += 1
+            if count % 10000 == 0:
+                samples.append(current_rss_mb())
+        elapsed = time.time() - start
+    finally:
+        if args.report is None and not args.keep:
+            os.remove(path)
+
+    print(f"Parsed {count} findings from {size_mb:.0f} MB in {elapsed:.1f}s ({size_mb / elapsed:.1f} MB/s)")
+    print(f"RSS before parsing: {baseline_rss:.1f} MB")
+    if samples:
+        print(f"RSS while parsing: min {min(samples):.1f} MB, max {max(samples):.1f} MB over {len(samples)} samples")
+    print(f"Peak RSS: {peak_rss_mb():.1f} MB")
+
+if __name__ == "__main__":
+    main()
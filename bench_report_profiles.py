@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+from appscan_report import iter_findings
+from asoc_client import ASoCClient, set_client
+from dd1 import get_token, generate_report, download_report_to_file
+from report_profiles import REPORT_PROFILES
+
+def bench_profile(token, scan_id, profile, report_dir):
+    # Time from the generation request until the report is downloaded, the
+    # same way the scan scripts fetch it
+    start = time.time()
+    report_id = generate_report(token, scan_id, profile)["Id"]
+    path = os.path.join(report_dir, f"{scan_id}_{profile}.xml")
+    report = download_report_to_file(token, report_id, path, history_key=scan_id, profile=profile)
+    elapsed = time.time() - start
+    try:
+        findings = sum(1 for _ in iter_findings(path))
+    except ET.ParseError:
+        findings = None
+    os.remove(path)
+    return {"profile": profile, "scan_id": scan_id, "seconds": round(elapsed, 3), "bytes": report["size"], "findings": findings}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report generation time and size for each report profile")
+    parser.add_argument("api_key", help="ASoC API Key")
+    parser.add_argument("api_secret", help="ASoC API Secret")
+    parser.add_argument("scan_id", nargs="+", help="Completed scans to generate reports for")
+    parser.add_argument("--profiles", nargs="+", choices=REPORT_PROFILES, default=list(REPORT_PROFILES), help="Profiles to compare")
+    parser.add_argument("--repeat", type=int, default=1, help="Reports generated per scan and profile")
+    parser.add_argument("--results", help="File the per-report measurements are appended to as JSON lines")
+    args = parser.parse_args()
+
+    set_client(ASoCClient(pool_size=1))
+    token = get_token(args.api_key, args.api_secret)
+
+    samples = {profile: [] for profile in args.profiles}
+    report_dir = tempfile.mkdtemp(prefix="asoc_bench_")
+    try:
+        for scan_id in args.scan_id:
+            for _ in range(args.repeat):
+                for profile in args.profiles:
+                    sample = bench_profile(token, scan_id, profile, report_dir)
+                    samples[profile].append(sample)
+                    print(f"{scan_id} {profile}: {sample['seconds']:.1f}s, {sample['bytes']} bytes, {sample['findings']} findings")
+                    if args.results:
+                        with open(args.results, "a") as f:
+                            f.write(json.dumps(sample) + "\n")
+    finally:
+        shutil.rmtree(report_dir, ignore_errors=True)
+
+    print(f"{'profile':<10} {'reports':>7} {'avg s':>8} {'avg MB':>9} {'findings':>9}")
+    for profile, runs in samples.items():
+        seconds = sum(r["seconds"] for r in runs) / len(runs)
+        size_mb = sum(r["bytes"] for r in runs) / len(runs) / (1024 * 1024)
+        findings = sum(r["findings"] or 0 for r in runs)
+        print(f"{profile:<10} {len(runs):>7} {seconds:>8.1f} {size_mb:>9.2f} {findings:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Invocations that return before any network call; dd1.py without arguments
+# prints its usage after importing everything, like the old scripts did
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "asoc --help": [os.path.join(HERE, "asoc.py"), "--help"],
+    "asoc scan --help": [os.path.join(HERE, "asoc.py"), "scan", "--help"],
+    "asoc import --help": [os.path.join(HERE, "asoc.py"), "import", "--help"],
+    "dd1.py usage": [os.path.join(HERE, "dd1.py")],
+    "bulk_import.py --help": [os.path.join(HERE, "bulk_import.py"), "--help"],
+}
+
+def time_command(args, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=HERE)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup time of the command line tools")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per command")
+    parser.add_argument("commands", nargs="*", help=f"Commands to time, of: {', '.join(COMMANDS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [name for name in args.commands if name not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown command: {', '.join(unknown)}")
+
+    print(f"{'command':<24} {'median ms':>10} {'min ms':>8} {'max ms':>8}")
+    for name in args.commands or COMMANDS:
+        samples = time_command(COMMANDS[name], args.runs)
+        print(f"{name:<24} {statistics.median(samples):>10.1f} {min(samples):>8.1f} {max(samples):>8.1f}")
+
+if __name__ == "__main__":
+    main()
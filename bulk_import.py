@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from defectdojo import CHUNK_ISSUES, CHUNK_MB, create_product_if_not_exists, create_new_engagement, import_scan_chunked
+from dojo_client import get_dojo_client
+from findings_dedupe import DEDUPE_HELP, DEDUPE_OFF, DEDUPE_SCOPE, DEDUPE_SCOPES, dedupe_report, dedupe_scope, get_finding_index
+from import_cache import get_import_cache, report_fingerprint
+
+DEFAULT_SCAN_TYPE = "HCLAppScan XML DAST"
+
+def find_reports(source):
+    # A directory is expanded to the XML reports in it, anything else is a glob
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.xml")
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+def load_mapping(path):
+    # Rules mapping report file names to product/engagement, either a CSV
+    # with a pattern,product,engagement header (optionally product_type) or a
+    # JSON list of objects.
+    # Patterns are fnmatch globs on the file name; the first match wins.
+    with open(path, newline="") as f:
+        if path.lower().endswith(".json"):
+            rules = json.load(f)
+        else:
+            rules = list(csv.DictReader(f))
+
+    for i, rule in enumerate(rules):
+        missing = [k for k in ("pattern", "product") if not rule.get(k)]
+        if missing:
+            raise ValueError(f"Mapping rule {i} is missing {', '.join(missing)}")
+    return rules
+
+def report_name(path):
+    # dd1.py writes reports as <scan name>_report.xml
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[:-len("_report")] if name.endswith("_report") else name
+
+def resolve_target(path, rules, product, engagement):
+    name = report_name(path)
+    for rule in rules:
+        if fnmatch.fnmatch(os.path.basename(path), rule["pattern"]):
+            product = rule["product"]
+            engagement = rule.get("engagement") or engagement
+            break
+    if product is None:
+        return None
+    return product.format(name=name), engagement.format(name=name)
+
+def literal_name(name):
+    # resolve_target formats product and engagement names as {name}
+    # templates; this keeps a plain name as it is, braces included
+    return name.replace("{", "{{").replace("}", "}}")
+
+def resolve_product_type(path, rules):
+    # Optional product_type of the first rule matching the file, used to
+    # pick the DefectDojo shard, see dojo_shards.py
+    for rule in rules:
+        if fnmatch.fnmatch(os.path.basename(path), rule["pattern"]):
+            return rule.get("product_type") or None
+    return None
+
+def bootstrap(token, url, product_name, engagement_name):
+    product_id = create_product_if_not_exists(token, product_name, url)
+    if product_id is None:
+        raise ValueError(f"Product '{product_name}' not found or could not be created.")
+    engagement_id = create_new_engagement(token, product_id, engagement_name, url)
+    return product_id, engagement_id
+
+def import_one(token, url, scan_type, path, target, engagements, fingerprint=None, dedupe=DEDUPE_OFF, chunk_issues=CHUNK_ISSUES,
+               chunk_mb=CHUNK_MB):
+    record = {"file": path, "product": target[0], "engagement": target[1], "status": None, "error": None}
+    start = time.time()
+    upload_path = path
+    scope = dedupe_scope(dedupe, url, target[0])
+    claimed = set()
+    try:
+        if dedupe != DEDUPE_OFF:
+            upload_path, claimed = dedupe_report(path, scope, get_finding_index())
+            if upload_path is None:
+                # Every finding is already in DefectDojo
+                record["status"] = "duplicate"
+                record["seconds"] = round(time.time() - start, 3)
+                return record
+        product_id, engagement_id = engagements[target].result()
+        record["bootstrap_seconds"] = round(time.time() - start, 3)
+        response = import_scan_chunked(token, product_id, engagement_id, upload_path, url, scan_type, chunk_issues, chunk_mb)
+        record["status"] = response.status_code
+        if response.status_code != 201:
+            record["error"] = response.text[:500]
+        else:
+            if fingerprint is not None:
+                import_cache = get_import_cache()
+                import_cache.record(import_cache.key(url, *target, scan_type), fingerprint)
+            if claimed:
+                get_finding_index().commit(scope, claimed)
+    except Exception as e:
+        record["error"] = str(e)
+    finally:
+        if record["error"] and claimed:
+            get_finding_index().release(scope, claimed)
+        if upload_path not in (None, path):
+            os.remove(upload_path)
+    record["seconds"] = round(time.time() - start, 3)
+    return record
+
+def bulk_import(token, url, paths, rules, product=None, engagement="{name}", scan_type=DEFAULT_SCAN_TYPE, workers=8, skip_unchanged=True,
+                dedupe=DEDUPE_SCOPE, chunk_issues=CHUNK_ISSUES, chunk_mb=CHUNK_MB, use_async=False, timeout=None):
+    # Every product/engagement pair is bootstrapped once, then each report
+    # uploads as soon as its engagement exists. All calls share one pooled
+    # session to the instance. Reports whose findings match the last import
+    # into the same product/engagement are skipped without any request.
+    # With dedupe on, findings already uploaded into the same product (or
+    # instance) are removed from each report first, see findings_dedupe.py.
+    # Reports over the chunk limits are imported as parallel sub-reports.
+    # With use_async the bootstraps and uploads run as tasks of one event
+    # loop instead of threads, with workers connections, see dojo_async.py.
+    if use_async and (dedupe != DEDUPE_OFF or chunk_issues or chunk_mb):
+        raise ValueError("dedupe and chunked imports are not available with use_async")
+    get_dojo_client(url, pool_size=workers)
+    records = []
+    targets = {}
+    for path in paths:
+        target = resolve_target(path, rules, product, engagement)
+        if target is None:
+            records.append({"file": path, "product": None, "engagement": None, "status": None,
+                            "error": "No mapping rule matches this file", "seconds": 0})
+        else:
+            targets[path] = target
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fingerprints = {}
+        if skip_unchanged:
+            import_cache = get_import_cache()
+            fingerprints = dict(zip(targets, pool.map(report_fingerprint, targets)))
+            for path, target in list(targets.items()):
+                if import_cache.unchanged(import_cache.key(url, *target, scan_type), fingerprints[path]):
+                    del targets[path]
+                    print(f"{path}: findings unchanged since the last import, skipped")
+                    records.append({"file": path, "product": target[0], "engagement": target[1], "status": "skipped",
+                                    "error": None, "seconds": 0})
+
+        if use_async:
+            records.extend(import_async(token, url, scan_type, targets, fingerprints, workers, timeout))
+            return records
+
+        engagements = {}
+        for target in dict.fromkeys(targets.values()):
+            engagements[target] = pool.submit(bootstrap, token, url, *target)
+        futures = [pool.submit(import_one, token, url, scan_type, path, target, engagements, fingerprints.get(path), dedupe,
+                               chunk_issues, chunk_mb)
+                   for path, target in targets.items()]
+        for future in futures:
+            record = future.result()
+            print(f"{record['file']}: {record['status'] or 'failed'} in {record['seconds']}s" + (f" ({record['error']})" if record["error"] else ""))
+            records.append(record)
+    return records
+
+def import_async(token, url, scan_type, targets, fingerprints, connections, timeout=None):
+    # aiohttp is only needed, and imported, in this mode
+    import asyncio
+    from dojo_async import import_reports
+
+    import_cache = get_import_cache()
+
+    def on_done(record):
+        print(f"{record['file']}: {record['status'] or 'failed'} in {record['seconds']}s" + (f" ({record['error']})" if record["error"] else ""))
+        if record["status"] == 201 and fingerprints.get(record["file"]) is not None:
+            target = (record["product"], record["engagement"])
+            import_cache.record(import_cache.key(url, *target, scan_type), fingerprints[record["file"]])
+
+    return asyncio.run(import_reports(url, token, targets, scan_type, connections, timeout, on_done))
+
+def main():
+    parser = argparse.ArgumentParser(description="Import many scan reports into DefectDojo in parallel")
+    parser.add_argument("url", help="DefectDojo URL")
+    parser.add_argument("token", help="Authorization Token")
+    parser.add_argument("source", help="Directory of XML reports or a glob pattern")
+    parser.add_argument("--mapping", help="CSV or JSON rules mapping file name patterns to product/engagement")
+    parser.add_argument("--product", help="Product for files no rule matches; {name} is the report name")
+    parser.add_argument("--engagement", default="{name}", help="Engagement name; {name} is the report name")
+    parser.add_argument("--scan-type", default=DEFAULT_SCAN_TYPE, help="DefectDojo scan type")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent requests")
+    parser.add_argument("--results", help="File the per-file result records are written to as JSON lines")
+    parser.add_argument("--force", action="store_true", help="Upload reports even if their findings are unchanged")
+    parser.add_argument("--dedupe", choices=DEDUPE_SCOPES, default=DEDUPE_SCOPE,
+                        help=DEDUPE_HELP)
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run the bootstraps and uploads on one asyncio event loop (needs aiohttp), "
+                             "with --workers connections, for hundreds of reports at once")
+    parser.add_argument("--timeout", type=float, help="With --async, seconds before a report's import is cancelled")
+    parser.add_argument("--chunk-issues", type=int, default=CHUNK_ISSUES,
+                        help="Import reports with more issues than this in parallel chunks of this many issues")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB,
+                        help="Import reports with more megabytes of issues than this in parallel chunks of this size")
+    args = parser.parse_args()
+    if args.use_async and (args.dedupe != DEDUPE_OFF or args.chunk_issues or args.chunk_mb):
+        parser.error("--async cannot be combined with --dedupe or chunked imports")
+
+    paths = find_reports(args.source)
+    if not paths:
+        print(f"No reports found in {args.source}")
+        sys.exit(1)
+    rules = load_mapping(args.mapping) if args.mapping else []
+
+    start = time.time()
+    records = bulk_import(args.token, args.url, paths, rules, args.product, args.engagement, args.scan_type, args.workers, not args.force,
+                          args.dedupe, args.chunk_issues, args.chunk_mb, args.use_async, args.timeout)
+    failed = [r for r in records if r["error"]]
+
+    if args.results:
+        with open(args.results, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    stats = get_import_cache().stats()
+    skipped = len([r for r in records if r["status"] == "skipped"])
+    duplicates = len([r for r in records if r["status"] == "duplicate"])
+    print(f"Imported {len(records) - len(failed) - skipped - duplicates} of {len(records)} reports, {skipped} unchanged, "
+          f"in {time.time() - start:.1f}s (skip cache: {stats['hits']} hits, {stats['misses']} misses)")
+    responses = get_dojo_client(args.url).cache.stats()
+    print(f"Response cache: {responses['hits']} hits, {responses['revalidated']} revalidated, {responses['misses']} misses")
+    if args.dedupe != DEDUPE_OFF:
+        dedupe = get_finding_index().stats()
+        print(f"Dedupe: {dedupe['duplicates']} of {dedupe['findings']} findings left out ({dedupe['ratio']:.1%}), "
+              f"{duplicates} reports had nothing new")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
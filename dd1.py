@@ -1,42 +1,48 @@
 #!/usr/bin/env python3
 import requests
+import hashlib
 import json
+import os
 import sys
 import time
 
+from asoc_client import BASE_API_URL, get_client
+from job_store import PHASE_GENERATING, PHASE_DOWNLOADING, PHASE_DONE, PHASE_FAILED, get_job_store
+from metrics import get_metrics, phase
+from report_profiles import REPORT_PROFILE, report_configuration
+from report_readiness import get_report_history, wait_for_report
+from scan_schedule import expected_duration, poll_delay, scan_duration, scan_timeout
+from token_cache import get_cached_token
+
 # The ASoC REST APIs used in this script:
-REST_APIKEYLOGIN = "https://cloud.appscan.com/api/v2/Account/ApiKeyLogin"
-REST_SCANS = "https://cloud.appscan.com/api/v2/Scans/DynamicAnalyzer"
+REST_APIKEYLOGIN = f"{BASE_API_URL}/Account/ApiKeyLogin"
+REST_SCANS = f"{BASE_API_URL}/Scans/DynamicAnalyzer"
+REST_SCAN_EXECUTIONS = f"{BASE_API_URL}/Scans"
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+SCAN_MODE_FULL = "full"
+SCAN_MODE_INCREMENTAL = "incremental"
+SCAN_MODE_AUTO = "auto"
+SCAN_MODES = (SCAN_MODE_FULL, SCAN_MODE_INCREMENTAL, SCAN_MODE_AUTO)
+# In auto mode a full scan replaces the baseline after this many seconds
+FULL_SCAN_INTERVAL = float(os.environ.get("ASOC_FULL_SCAN_DAYS", "7")) * 24 * 60 * 60
+SCAN_MODE = os.environ.get("ASOC_SCAN_MODE", SCAN_MODE_FULL)
+# Consecutive failed status checks before a single scan run gives up
+MAX_STATUS_ERRORS = 10
+# Seconds between status checks when there is no duration history
+POLL_INTERVAL = 30
 
 def generate_engagement_id():
     return str(int(time.time()))  # Use timestamp as engagement ID
 
-def generate_report(token, scan_id):
+@phase("generate")
+def generate_report(token, scan_id, profile=REPORT_PROFILE):
     try:
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {token}",
-        }
         scope = "Scan"
         report_id = scan_id
-        response = requests.post(f"https://cloud.appscan.com/api/v2/Reports/Security/{scope}/{report_id}", headers=headers, json={
-            "Configuration": {
-                "Summary": True,
-                "Details": True,
-                "Discussion": True,
-                "Overview": True,
-                "TableOfContent": True,
-                "Advisories": True,
-                "FixRecommendation": True,
-                "History": True,
-                "Coverage": True,
-                "MinimizeDetails": True,
-                "Articles": True,
-                "ReportFileType": "XML",
-                "Title": "string",
-                "Notes": "string",
-                "Locale": "string"
-            }
+        response = get_client().post(f"Reports/Security/{scope}/{report_id}", token=token, json={
+            "Configuration": report_configuration(profile)
         })
         response.raise_for_status()
         json_data = json.loads(response.text)
@@ -45,33 +51,104 @@ def generate_report(token, scan_id):
         print("Error in generate_report():\n" + str(e))
         sys.exit(1)
 
-def download_report(token, report_id):
+def download_report_to_file(token, report_id, path, expected_sha256=None, max_resumes=5, history_key=None, profile=None):
+    # Streams the report to <path>.part in fixed-size chunks and renames it
+    # into place once complete, so memory use does not depend on report size.
+    # A dropped connection is resumed with an HTTP Range request. The body is
+    # only requested once a probe reports it ready; history_key (the app) and
+    # profile feed the report history that predicts when that will be.
+    url = f"Reports/Download/{report_id}"
+    part_path = path + ".part"
+    # Sizes and Range offsets count the bytes on the wire, so ask for them
+    # unencoded; requests would otherwise accept gzip and decode it
+    headers = {"Accept-Encoding": "identity"}
     try:
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {token}",
-        }
-        url = f"https://cloud.appscan.com/api/v2/Reports/Download/{report_id}"
-
-        # Add a loop to check report availability
-        for _ in range(60):  # Check for up to 60 seconds (adjust as needed)
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                return response.content
-            elif response.status_code == 404:
-                # Report not ready yet, wait and try again
-                time.sleep(5)  # Wait 5 seconds (adjust as needed)
+        with phase("report_ready"):
+            ready_seconds = wait_for_report(token, report_id, history_key, profile)
+            # The download can lag the status briefly
+            for _ in range(5):
+                response = get_client().get(url, token=token, stream=True, headers=headers)
+                if response.status_code == 200:
+                    break
+                response.close()
+                if response.status_code == 404:
+                    time.sleep(2)
+                else:
+                    response.raise_for_status()
             else:
-                response.raise_for_status()
+                print("Report download timed out.")
+                sys.exit(1)
+        download_started = time.monotonic()
 
-        # If the loop completes without success
-        print("Report download timed out.")
-        sys.exit(1)
+        total = None
+        written = 0
+        resumes = 0
+        digest = hashlib.sha256()
+        with open(part_path, "wb") as f:
+            while True:
+                if response.status_code == 200:
+                    # Full body: start (or start over) from the beginning
+                    f.seek(0)
+                    f.truncate()
+                    written = 0
+                    digest = hashlib.sha256()
+                    # A server encoding the body anyway: its length is not what
+                    # is written, and it cannot be resumed by offset
+                    encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+                    total = None if encoded else _content_length(response)
+                    resumable = total is not None
+
+                try:
+                    with response:
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            written += len(chunk)
+                    if total is None or written >= total:
+                        break
+                except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError) as e:
+                    print(f"Report download interrupted after {written} bytes: {e}")
+
+                resumes += 1
+                get_metrics().count_retry("asoc", "download_resume")
+                if resumes > max_resumes:
+                    raise requests.exceptions.RequestException(f"Report download incomplete after {max_resumes} resumes")
+
+                range_headers = {"Range": f"bytes={written}-"} if resumable else {}
+                response = get_client().get(url, token=token, stream=True, headers={**headers, **range_headers})
+                if response.status_code == 206 and not response.headers.get("Content-Range", "").startswith(f"bytes {written}-"):
+                    response.close()
+                    raise requests.exceptions.RequestException("Server returned an unexpected range resuming report download")
+                elif response.status_code not in (200, 206):
+                    response.raise_for_status()
+                    raise requests.exceptions.RequestException(f"Unexpected status {response.status_code} resuming report download")
+
+        if total is not None and written != total:
+            raise requests.exceptions.RequestException(f"Report size mismatch: expected {total} bytes, got {written}")
+        sha256 = digest.hexdigest()
+        if expected_sha256 is not None and sha256 != expected_sha256.lower():
+            raise requests.exceptions.RequestException(f"Report checksum mismatch: expected {expected_sha256}, got {sha256}")
+
+        os.replace(part_path, path)
+        get_metrics().observe_phase("download", time.monotonic() - download_started)
+        get_report_history().record(history_key, profile, written, ready_seconds)
+        return {"path": path, "size": written, "sha256": sha256}
 
     except requests.exceptions.RequestException as e:
-        print("Error in download_report():\n" + str(e))
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        print("Error in download_report_to_file():\n" + str(e))
         sys.exit(1)
 
+def _content_length(response):
+    # Total size of the complete report, from Content-Length or a Content-Range of a 206
+    content_range = response.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        size = content_range.rsplit("/", 1)[1]
+        return int(size) if size.isdigit() else None
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
 def main():
     if len(sys.argv) != 6:
         print("\nUsage: python appscan_dast.py <API_Key> <API_Secret> <App_ID> <Target_URL> <Scan_Name>\n")
@@ -84,9 +161,26 @@ def main():
     SCAN_NAME = sys.argv[5]
 
     token = get_token(API_KEY, API_SECRET)
+    run_single_scan(token, APP_ID, TARGET_URL, SCAN_NAME)
 
-    scan_id = start_dast_scan(token, APP_ID, TARGET_URL, SCAN_NAME)
-    print(f"DAST scan started successfully. Scan ID: {scan_id}")
+def run_single_scan(token, app_id, target_url, scan_name, mode=SCAN_MODE, report_profile=REPORT_PROFILE, presence_id=None,
+                    max_time=None, progress=False):
+    # An unknown profile would otherwise only fail once the scan is done
+    report_configuration(report_profile)
+    store = get_job_store()
+    scan_id, incremental = start_scheduled_scan(token, app_id, target_url, scan_name, mode, store=store, presence_id=presence_id)
+    print(f"DAST {'incremental' if incremental else 'full'} scan started successfully. Scan ID: {scan_id}")
+
+    # Past scans of this app predict when this one completes and how long
+    # is too long for it
+    eta = expected_duration(store, app_id, incremental)
+    if max_time is None:
+        max_time = scan_timeout(store, app_id, incremental)
+    if eta is not None:
+        print(f"Expected to complete in about {eta / 60:.0f} minutes, timeout {max_time / 60:.0f} minutes")
+
+    # Record the scan so resume.py can pick it up if this process dies
+    job_id = store.add(scan_id, app_id, target_url, scan_name, os.path.abspath(f"{scan_name}_report.xml"), incremental)
 
     # Generate engagement ID
     engagement_id = generate_engagement_id()
@@ -94,14 +188,28 @@ def main():
     print(f"Waiting for scan to finish")
     start = time.time()
     elapsed = 0
-    max = 60 * 30
 
-    while elapsed < max:
+    pbar = None
+    if progress:
+        import tqdm
+        pbar = tqdm.tqdm(total=max_time)  # Initialize progress bar with total steps
+
+    status_errors = 0
+    while elapsed < max_time:
         prev_status = ""
         status_obj = get_scan_status(token, scan_id)
         if status_obj is None:
-            print("Error getting status")
-            break
+            # The scan keeps running on ASoC; only give up once the status
+            # has been unavailable for a while
+            status_errors += 1
+            if status_errors >= MAX_STATUS_ERRORS:
+                print(f"Error getting status {status_errors} times in a row, giving up")
+                break
+            print("Error getting status, retrying")
+            time.sleep(POLL_INTERVAL)
+            elapsed = time.time() - start
+            continue
+        status_errors = 0
         
         status = status_obj["Status"]
 
@@ -109,6 +217,9 @@ def main():
             prev_status = status
             print(f"Scan Status: {prev_status}")
 
+        if status in ("Completed", "Error") and pbar is not None:
+            pbar.close()
+
         if status == "Completed":
             print(f"Scan completed with status: {status}")
             print("Scan Summary:")
@@ -116,50 +227,57 @@ def main():
             print(f"\t Med Issues: {status_obj['MediumVulnerabilities']}")
             print(f"\t Low Issues: {status_obj['LowVulnerabilities']}")
             print()
-            print(f"For full details visit: https://cloud.appscan.com/main/myapps/{APP_ID}/scans/{scan_id}/scanOverview")
+            print(f"For full details visit: https://cloud.appscan.com/main/myapps/{app_id}/scans/{scan_id}/scanOverview")
+            get_metrics().observe_phase("wait", time.time() - start)
+            store.record_duration(app_id, incremental, scan_duration(status_obj, start, live=True))
+            if not incremental:
+                store.set_baseline(app_id, scan_id, target_url)
             
             # Generate report
-            report_data = generate_report(token, scan_id)
+            store.update(job_id, PHASE_GENERATING)
+            report_data = generate_report(token, scan_id, report_profile)
             report_id = report_data['Id']
+            store.update(job_id, PHASE_DOWNLOADING, report_id=report_id)
             print(f"Report generated successfully. Report ID: {report_id}")
 
             # Download report
-            time.sleep(20)
-            report_content = download_report(token, report_id)
-            with open(f"{SCAN_NAME}_report.xml", "wb") as f:
-                f.write(report_content)
+            report = download_report_to_file(token, report_id, f"{scan_name}_report.xml", history_key=app_id,
+                                             profile=report_profile)
+            store.update(job_id, PHASE_DONE)
 
-            print(f"Report downloaded as {SCAN_NAME}_report.xml")
+            print(f"Report downloaded as {report['path']} ({report['size']} bytes, sha256 {report['sha256']})")
             
             break
         elif status == "Error":
             print(f"Scan completed with status: {status}")
             print(f"Error message: {status_obj['ErrorMessage']}")
+            get_metrics().observe_phase("wait", time.time() - start, "error")
+            store.update(job_id, PHASE_FAILED, error=status_obj['ErrorMessage'])
             break
         
-        time.sleep(30)
+        delay = min(poll_delay(elapsed, eta, POLL_INTERVAL), max(max_time - elapsed, 0))
+        time.sleep(delay)
         elapsed = time.time() - start
+        if pbar is not None:
+            pbar.update(delay)  # Update progress bar with the seconds slept
 
-    if elapsed >= max:
-        print("Scan timed out after 30 minutes.")
+    if elapsed >= max_time:
+        if pbar is not None:
+            pbar.close()
+        get_metrics().observe_phase("wait", elapsed, "error")
+        print(f"Scan timed out after {max_time / 60:.0f} minutes.")
 
 def get_token(api_key, api_secret):
     try:
-        json_data = {"KeyId": api_key, "KeySecret": api_secret}
-        response = requests.post(REST_APIKEYLOGIN, json=json_data)
-        response.raise_for_status()
-        json_data = json.loads(response.text)
-        return json_data['Token']
+        # Shared on-disk token cache; only logs in when the cached token is about to expire
+        return get_cached_token(api_key, api_secret, REST_APIKEYLOGIN)
     except requests.exceptions.RequestException as e:
         print("Error in get_token():\n" + str(e))
         sys.exit(1)
 
-def start_dast_scan(token, app_id, target_url, scan_name):
+@phase("start")
+def start_dast_scan(token, app_id, target_url, scan_name, presence_id=None):
     try:
-        headers = {
-            "Authorization": "Bearer " + token,
-            "Content-Type": "application/json"
-        }
         json_data = {
             "AppId": app_id,
             "StartingUrl": target_url,
@@ -168,7 +286,10 @@ def start_dast_scan(token, app_id, target_url, scan_name):
             "Incremental": False,
             "UserAgent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36"
         }
-        response = requests.post(REST_SCANS, headers=headers, json=json_data)
+        if presence_id:
+            # AppScan Presence that reaches targets on private networks
+            json_data["PresenceId"] = presence_id
+        response = get_client().post(REST_SCANS, token=token, json=json_data)
         response.raise_for_status()
         json_data = json.loads(response.text)
         return json_data['Id']
@@ -176,22 +297,52 @@ def start_dast_scan(token, app_id, target_url, scan_name):
         print("Error in start_dast_scan():\n" + str(e))
         sys.exit(1)
 
+@phase("start")
+def start_incremental_scan(token, scan_id):
+    # New incremental execution of an existing scan; it keeps the scan id
+    try:
+        json_data = {"IsIncremental": True, "IsRetest": False}
+        response = get_client().post(f"{REST_SCAN_EXECUTIONS}/{scan_id}/Executions", token=token, json=json_data)
+        response.raise_for_status()
+        return scan_id
+    except requests.exceptions.RequestException as e:
+        print("Error in start_incremental_scan():\n" + str(e))
+        sys.exit(1)
+
+def start_scheduled_scan(token, app_id, target_url, scan_name, mode=SCAN_MODE_FULL, full_interval=FULL_SCAN_INTERVAL, store=None,
+                         presence_id=None):
+    # Returns (scan_id, incremental). Outside full mode an incremental
+    # execution of the app's baseline is started, unless there is no
+    # baseline for this target yet or, in auto mode, it is older than
+    # full_interval seconds.
+    if mode not in SCAN_MODES:
+        raise ValueError(f"Unknown scan mode '{mode}', expected one of {', '.join(SCAN_MODES)}")
+    store = store or get_job_store()
+    baseline = store.get_baseline(app_id) if mode != SCAN_MODE_FULL else None
+    if baseline is not None and baseline["target_url"] == target_url:
+        if mode == SCAN_MODE_INCREMENTAL or time.time() - baseline["created"] < full_interval:
+            return start_incremental_scan(token, baseline["scan_id"]), True
+    return start_dast_scan(token, app_id, target_url, scan_name, presence_id), False
+
 def get_scan_status(token, scan_id):
-    headers = {
-        "accept": "application/json",
-        "Authorization": f"Bearer {token}",
-    }
-    r = requests.get(f"https://cloud.appscan.com/api/v2/Scans/DynamicAnalyzer/{scan_id}", headers=headers)
+    try:
+        r = get_client().get(f"{REST_SCANS}/{scan_id}", token=token)
+    except requests.exceptions.RequestException as e:
+        print(f"Error getting scan status: {e}")
+        return None
     if r.status_code != 200:
         print(f"Error getting scan status: {r.status_code}")
         return None
-    response_json = r.json()
+    return scan_status_from_json(r.json())
+
+def scan_status_from_json(response_json):
     return {
         "Status": response_json.get("LatestExecution", {}).get("ExecutionProgress"),
         "HighVulnerabilities": response_json.get("LatestExecution", {}).get("NHighIssues"),
         "MediumVulnerabilities": response_json.get("LatestExecution", {}).get("NMediumIssues"),
         "LowVulnerabilities": response_json.get("LatestExecution", {}).get("NLowIssues"),
-        "ErrorMessage": response_json.get("LatestExecution", {}).get("ErrorMessage")
+        "ErrorMessage": response_json.get("LatestExecution", {}).get("ErrorMessage"),
+        "Duration": response_json.get("LatestExecution", {}).get("ExecutionDurationSec"),
     }
 
 if __name__ == "__main__":
@@ -1,28 +1,35 @@
+import os
 import sys
-import requests
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def get_product_id_by_name(token, product_name, url):
-    headers = {
-        "Authorization": f"Token {token}",
-        "Content-Type": "application/json"
-    }
-    response = requests.get(f"{url}/api/v2/products/", headers=headers)
+import requests
 
-    products = response.json()
-    if 'results' in products:
-        for product in products['results']:
-            if product['name'] == product_name:
-                return product['id']
+from dojo_client import get_dojo_client
+from import_cache import get_import_cache, report_fingerprint
+from metrics import get_metrics, phase
+from multipart_upload import MultipartEncoder
+from product_index import get_product_index
+from rate_limiter import retry_delay
+from report_split import split_report
 
-    return None
+UPLOAD_GZIP = os.environ.get("DOJO_UPLOAD_GZIP", "") == "1"
+# Reports with more issues or megabytes of issues than this are imported in
+# chunks; 0 turns the limit off
+CHUNK_ISSUES = int(os.environ.get("DOJO_CHUNK_ISSUES", "0"))
+CHUNK_MB = float(os.environ.get("DOJO_CHUNK_MB", "0"))
+CHUNK_WORKERS = int(os.environ.get("DOJO_CHUNK_WORKERS", "4"))
+CHUNK_RETRIES = int(os.environ.get("DOJO_CHUNK_RETRIES", "3"))
+# After a failed import-scan, how often and how many seconds apart to look
+# for the test DefectDojo may have created anyway
+CREATED_TEST_CHECKS = 3
+CREATED_TEST_WAIT = 10
+
+def get_product_id_by_name(token, product_name, url):
+    return get_product_index(url).get(token, product_name)
 
 def create_new_engagement(token, product_id, engagement_name, url):
-    headers = {
-        "Authorization": f"Token {token}",
-        "Content-Type": "application/json"
-    }
-    url = f"{url}/api/v2/engagements/"
     
     today = datetime.date.today()
     target_end_date = today + datetime.timedelta(days=15)
@@ -33,7 +40,7 @@ def create_new_engagement(token, product_id, engagement_name, url):
         "target_start": today.isoformat(),
         "target_end": target_end_date.isoformat()
     }
-    response = requests.post(url, headers=headers, json=data)
+    response = get_dojo_client(url).post("api/v2/engagements/", token=token, json=data)
 
     if response.status_code == 201:
         engagement = response.json()
@@ -43,51 +50,196 @@ def create_new_engagement(token, product_id, engagement_name, url):
         print(f"Response content: {response.text}")
         raise ValueError(f"Failed to create new engagement.")
 
-def post_engagement_and_import_scan(token, product_name, engagement_name, file_path, url, scan_type):
+def post_engagement_and_import_scan(token, product_name, engagement_name, file_path, url, scan_type, skip_unchanged=True):
+    import_cache = get_import_cache()
+    cache_key = import_cache.key(url, product_name, engagement_name, scan_type)
+    fingerprint = report_fingerprint(file_path) if skip_unchanged else None
+    if fingerprint is not None and import_cache.unchanged(cache_key, fingerprint):
+        print(f"Findings in {file_path} are unchanged since the last import, skipping upload.")
+        return
+
     product_id = get_product_id_by_name(token, product_name, url)
 
     engagement_id = create_new_engagement(token, product_id, engagement_name, url)
 
-    headers2 = {
-        "Authorization": f"Token {token}"
-    }
+    response2 = import_scan_chunked(token, product_id, engagement_id, file_path, url, scan_type)
+    if response2.status_code == 201 and fingerprint is not None:
+        import_cache.record(cache_key, fingerprint)
+
+    print("Response 2:", response2.text)
 
-    data2 = {
+@phase("import")
+def import_scan(token, product_id, engagement_id, file_path, url, scan_type, compress=UPLOAD_GZIP):
+    data = {
         "scan_type": scan_type,
         "engagement": engagement_id,
         "product": product_id
     }
+    return upload_scan(token, "api/v2/import-scan/", data, file_path, url, compress)
 
-    files = {
-        "file": open(file_path, "rb")
+@phase("import")
+def reimport_scan(token, test_id, file_path, url, scan_type, compress=UPLOAD_GZIP):
+    # Adds the findings of file_path to an existing test; the findings
+    # already in the test are left open
+    data = {
+        "scan_type": scan_type,
+        "test": test_id,
+        "close_old_findings": "false",
     }
+    return upload_scan(token, "api/v2/reimport-scan/", data, file_path, url, compress)
 
-    url2 = f"{url}/api/v2/import-scan/"
+def upload_scan(token, endpoint, data, file_path, url, compress=UPLOAD_GZIP):
+    # Streamed from disk in chunks; only enable compress when a proxy in
+    # front of DefectDojo inflates gzip request bodies
+    body = MultipartEncoder(data, "file", file_path)
+    headers = {"Content-Type": body.content_type}
+    stream = body
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        stream = body.gzipped()
+    try:
+        return get_dojo_client(url).post(endpoint, token=token, data=stream, headers=headers)
+    finally:
+        if compress:
+            stream.close()
+        body.close()
 
-    response2 = requests.post(url2, headers=headers2, data=data2, files=files)
+def _upload_with_retry(upload, name, retries=CHUNK_RETRIES):
+    # Retries one chunk on connection errors, timeouts, 429 and 5xx, so a
+    # failed chunk costs only its own bytes again
+    for attempt in range(retries + 1):
+        try:
+            response = upload()
+        except requests.exceptions.RequestException as e:
+            if attempt == retries:
+                raise
+            print(f"Uploading {name} failed: {e}, retrying")
+            delay = retry_delay(None, attempt)
+        else:
+            if (response.status_code < 500 and response.status_code != 429) or attempt == retries:
+                return response
+            print(f"Uploading {name} returned {response.status_code}, retrying")
+            delay = retry_delay(response, attempt)
+        get_metrics().count_retry("defectdojo", "chunk")
+        time.sleep(delay)
 
-    print("Response 2:", response2.text)
+def import_scan_chunked(token, product_id, engagement_id, file_path, url, scan_type, max_issues=CHUNK_ISSUES, max_mb=CHUNK_MB,
+                        workers=CHUNK_WORKERS, retries=CHUNK_RETRIES):
+    # Imports a report too large for one request as valid sub-reports: the
+    # first creates the test, the others are reimported into that test in
+    # parallel. Returns the first failed response, or that of the first
+    # chunk. Reports within the limits go up in a single import-scan.
+    chunks = split_report(file_path, max_issues, int(max_mb * 1024 * 1024))
+    if len(chunks) == 1:
+        return import_scan(token, product_id, engagement_id, file_path, url, scan_type)
 
-def create_product(token, product_name, url):
-    headers = {
-        "Authorization": f"Token {token}",
-        "Content-Type": "application/json"
-    }
-    url = f"{url}/api/v2/products/"
+    try:
+        first, test_id = _import_first_chunk(token, product_id, engagement_id, chunks[0], url, scan_type, retries)
+        if first.status_code not in (200, 201):
+            return first
+
+        def reimport(chunk):
+            return _upload_with_retry(lambda: reimport_scan(token, test_id, chunk, url, scan_type), chunk, retries)
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(chunks) - 1)) as pool:
+            responses = list(pool.map(reimport, chunks[1:]))
+        failed = [response for response in responses if response.status_code not in (200, 201)]
+        print(f"{file_path}: imported in {len(chunks)} chunks into test {test_id}, {len(failed)} chunks failed")
+        return failed[0] if failed else first
+    finally:
+        for chunk in chunks:
+            os.remove(chunk)
+
+def _import_first_chunk(token, product_id, engagement_id, chunk, url, scan_type, retries=CHUNK_RETRIES):
+    # The import-scan creating the test is not retried blindly: after a
+    # timeout or server error DefectDojo may have created the test anyway,
+    # and a second import would create another. That test is looked up and
+    # the chunk reimported into it; only without one is the import retried.
+    # Returns the response and the test id.
+    for attempt in range(retries + 1):
+        try:
+            known = _engagement_tests(token, engagement_id, scan_type, url)
+            break
+        except requests.exceptions.RequestException as e:
+            if attempt == retries:
+                raise
+            print(f"Error listing the tests of engagement {engagement_id}: {e}, retrying")
+            time.sleep(retry_delay(None, attempt))
+
+    for attempt in range(retries + 1):
+        error = None
+        try:
+            response = import_scan(token, product_id, engagement_id, chunk, url, scan_type)
+        except requests.exceptions.RequestException as e:
+            error, response = e, None
+            print(f"Uploading {chunk} failed: {e}")
+        else:
+            if response.status_code in (200, 201):
+                result = response.json()
+                return response, result.get("test_id") or result.get("test")
+            if response.status_code < 500 and response.status_code != 429:
+                return response, None
+            print(f"Uploading {chunk} returned {response.status_code}")
 
+        # A 429 was turned away before processing; anything else may not have been
+        if response is None or response.status_code != 429:
+            test_id = _created_test(token, engagement_id, scan_type, url, known)
+            if test_id is not None:
+                print(f"Import of {chunk} created test {test_id} anyway, reimporting into it")
+                return _upload_with_retry(lambda: reimport_scan(token, test_id, chunk, url, scan_type), chunk, retries), test_id
+        if attempt == retries:
+            if error is not None:
+                raise error
+            return response, None
+        get_metrics().count_retry("defectdojo", "chunk")
+        time.sleep(retry_delay(response, attempt))
+
+def _engagement_tests(token, engagement_id, scan_type, url):
+    # Ids of the engagement's tests of scan_type. Uncached, since an import
+    # changes the listing without a POST to it.
+    tests = set()
+    next_url = "api/v2/tests/"
+    params = {"engagement": engagement_id, "limit": 100}
+    while next_url:
+        response = get_dojo_client(url).request("GET", next_url, token=token, params=params)
+        response.raise_for_status()
+        page = response.json()
+        tests.update(test["id"] for test in page.get("results", []) if test.get("scan_type") in (None, scan_type))
+        next_url = page.get("next")
+        params = None
+    return tests
+
+def _created_test(token, engagement_id, scan_type, url, known):
+    # A test of scan_type that appeared in the engagement since known was
+    # listed. DefectDojo may still be processing the upload, so it is looked
+    # for a few times.
+    for _ in range(CREATED_TEST_CHECKS):
+        time.sleep(CREATED_TEST_WAIT)
+        try:
+            created = _engagement_tests(token, engagement_id, scan_type, url) - known
+        except requests.exceptions.RequestException as e:
+            print(f"Error listing the tests of engagement {engagement_id}: {e}")
+            continue
+        if created:
+            return min(created)
+    return None
+
+def create_product(token, product_name, url):
     data = {
         "name": product_name,
         "prod_type": 1,
         "description": "Sample description"
     }
 
-    response = requests.post(url, headers=headers, json=data)
+    response = get_dojo_client(url).post("api/v2/products/", token=token, json=data)
 
     if response.status_code == 201:
         product = response.json()
+        get_product_index(url).add(product_name, product['id'])
         return product['id']
     elif response.status_code == 400:  # Product with the same name might already exist
         print(f"A product with the name '{product_name}' already exists.")
+        get_product_index(url).invalidate(product_name)
         return get_product_id_by_name(token, product_name, url)
     else:
         print(f"Failed to create new product. Status code: {response.status_code}")
@@ -108,9 +260,6 @@ if __name__ == '__main__':
 
     url, token, product_name, engagement_name, file_path, scan_type = sys.argv[1:]
 
-    product_id = create_product_if_not_exists(token, product_name, url)
-
-    if product_id is None:
-        raise ValueError(f"Product '{product_name}' not found or could not be created.")
-
-    post_engagement_and_import_scan(token, product_name, engagement_name, file_path, url, scan_type)
+    # Same as "asoc.py import"
+    from asoc import main
+    main(["import", url, token, product_name, engagement_name, file_path, "--scan-type", scan_type])
@@ -0,0 +1,205 @@
+import asyncio
+import datetime
+import json
+import os
+import time
+
+import aiohttp
+
+from dojo_client import DEFAULT_TIMEOUT
+from metrics import get_metrics, phase
+from product_index import get_product_index
+
+# Open connections per DefectDojo host; further requests queue for one
+LIMIT_PER_HOST = int(os.environ.get("DOJO_ASYNC_LIMIT", "50"))
+
+class Response:
+    # The parts of a requests.Response the DefectDojo helpers use, read in
+    # full before the connection goes back to the pool
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+class AsyncDojoClient:
+    # asyncio counterpart of DojoClient: one aiohttp session per instance
+    # with at most limit_per_host connections. Every request has the same
+    # connect and read timeouts as the blocking client, and cancelling the
+    # task awaiting a request aborts it and frees its connection.
+    def __init__(self, url, limit_per_host=LIMIT_PER_HOST, timeout=DEFAULT_TIMEOUT):
+        self.base_url = url.rstrip("/")
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        self._session = None
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(self, method, path, token=None, **kwargs):
+        if self._session is None:
+            # Created on first use, inside the running event loop
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if token:
+            headers["Authorization"] = f"Token {token}"
+        url = self.url(path)
+        start = time.monotonic()
+        try:
+            async with self._session.request(method, url, headers=headers, **kwargs) as response:
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError, asyncio.CancelledError):
+            get_metrics().observe_request("defectdojo", method, url, "error", time.monotonic() - start)
+            raise
+        get_metrics().observe_request("defectdojo", method, url, response.status, time.monotonic() - start,
+                                      received=len(text))
+        return Response(response.status, response.headers, text)
+
+    async def get(self, path, token=None, **kwargs):
+        return await self.request("GET", path, token=token, **kwargs)
+
+    async def post(self, path, token=None, **kwargs):
+        return await self.request("POST", path, token=token, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+async def get_product_id_by_name(client, token, product_name):
+    index = get_product_index(client.base_url)
+    product_id = index.cached(product_name)
+    if product_id is not None:
+        return product_id
+
+    with phase("product_lookup"):
+        next_url = "api/v2/products/"
+        params = {"name": product_name, "limit": 100}
+        while next_url:
+            index.lookups += 1
+            response = await client.get(next_url, token=token, params=params)
+            if response.status_code != 200:
+                raise aiohttp.ClientResponseError(None, (), status=response.status_code, message=response.text[:500])
+            products = response.json()
+            for product in products.get("results", []):
+                if product["name"] == product_name:
+                    index.add(product_name, product["id"])
+                    return product["id"]
+            next_url = products.get("next")
+            params = None
+    return None
+
+async def create_product(client, token, product_name):
+    data = {
+        "name": product_name,
+        "prod_type": 1,
+        "description": "Sample description"
+    }
+    response = await client.post("api/v2/products/", token=token, json=data)
+    if response.status_code == 201:
+        product = response.json()
+        get_product_index(client.base_url).add(product_name, product["id"])
+        return product["id"]
+    if response.status_code == 400:
+        # Created meanwhile by another run or task
+        get_product_index(client.base_url).invalidate(product_name)
+        return await get_product_id_by_name(client, token, product_name)
+    print(f"Failed to create new product. Status code: {response.status_code}")
+    print(f"Response content: {response.text}")
+    return None
+
+async def create_product_if_not_exists(client, token, product_name):
+    product_id = await get_product_id_by_name(client, token, product_name)
+    if product_id is not None:
+        return product_id
+    return await create_product(client, token, product_name)
+
+async def create_new_engagement(client, token, product_id, engagement_name):
+    today = datetime.date.today()
+    data = {
+        "name": engagement_name,
+        "product": product_id,
+        "target_start": today.isoformat(),
+        "target_end": (today + datetime.timedelta(days=15)).isoformat()
+    }
+    response = await client.post("api/v2/engagements/", token=token, json=data)
+    if response.status_code != 201:
+        raise ValueError(f"Failed to create new engagement. Status code: {response.status_code}: {response.text[:500]}")
+    return response.json()["id"]
+
+async def bootstrap(client, token, product_name, engagement_name):
+    product_id = await create_product_if_not_exists(client, token, product_name)
+    if product_id is None:
+        raise ValueError(f"Product '{product_name}' not found or could not be created.")
+    engagement_id = await create_new_engagement(client, token, product_id, engagement_name)
+    return product_id, engagement_id
+
+async def import_scan(client, token, product_id, engagement_id, file_path, scan_type):
+    with phase("import"), open(file_path, "rb") as f:
+        # aiohttp streams the file part from disk while sending
+        form = aiohttp.FormData()
+        form.add_field("scan_type", scan_type)
+        form.add_field("engagement", str(engagement_id))
+        form.add_field("product", str(product_id))
+        form.add_field("file", f, filename=os.path.basename(file_path), content_type="application/xml")
+        return await client.post("api/v2/import-scan/", token=token, data=form)
+
+async def import_reports(url, token, targets, scan_type, limit_per_host=LIMIT_PER_HOST, timeout=None, on_done=None):
+    # Bootstraps every product/engagement pair of targets ({path: (product,
+    # engagement)}) once and uploads each report as soon as its engagement
+    # exists, all as tasks of one event loop. timeout bounds each report;
+    # one that runs out is cancelled and recorded as failed. on_done(record)
+    # is called as each report finishes, e.g. to update the import cache.
+    async with AsyncDojoClient(url, limit_per_host) as client:
+        engagements = {}
+
+        async def import_one(path, target):
+            record = {"file": path, "product": target[0], "engagement": target[1], "status": None, "error": None}
+            start = time.time()
+            try:
+                if target not in engagements:
+                    engagements[target] = asyncio.ensure_future(bootstrap(client, token, *target))
+                # Shielded so a timed-out report does not cancel the bootstrap others wait on
+                product_id, engagement_id = await asyncio.shield(engagements[target])
+                record["bootstrap_seconds"] = round(time.time() - start, 3)
+                response = await import_scan(client, token, product_id, engagement_id, path, scan_type)
+                record["status"] = response.status_code
+                if response.status_code != 201:
+                    record["error"] = response.text[:500]
+            except asyncio.TimeoutError:
+                record["error"] = "Request timed out"
+            except Exception as e:
+                record["error"] = str(e) or type(e).__name__
+            record["seconds"] = round(time.time() - start, 3)
+            if on_done is not None:
+                on_done(record)
+            return record
+
+        async def bounded(path, target):
+            if timeout is None:
+                return await import_one(path, target)
+            try:
+                return await asyncio.wait_for(import_one(path, target), timeout)
+            except asyncio.TimeoutError:
+                record = {"file": path, "product": target[0], "engagement": target[1], "status": None,
+                          "error": f"Timed out after {timeout}s", "seconds": timeout}
+                if on_done is not None:
+                    on_done(record)
+                return record
+
+        try:
+            return await asyncio.gather(*(bounded(path, target) for path, target in targets.items()))
+        finally:
+            for future in engagements.values():
+                future.cancel()
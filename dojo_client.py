@@ -0,0 +1,84 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import timed_request
+from response_cache import ResponseCache
+
+DEFAULT_POOL_SIZE = int(os.environ.get("DOJO_POOL_SIZE", "10"))
+DEFAULT_TIMEOUT = (
+    float(os.environ.get("DOJO_CONNECT_TIMEOUT", "10")),
+    float(os.environ.get("DOJO_READ_TIMEOUT", "600")),
+)
+
+class DojoClient:
+    # Pooled keep-alive session to one DefectDojo instance, shared by every
+    # lookup, engagement and import call against that instance. GETs go
+    # through the response cache when there is one; a POST drops the cached
+    # responses of the collection it went to.
+    def __init__(self, url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, cache=None):
+        self.base_url = url.rstrip("/")
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, token=None, **kwargs):
+        headers = dict(kwargs.pop("headers", None) or {})
+        if token:
+            headers["Authorization"] = f"Token {token}"
+        kwargs.setdefault("timeout", self.timeout)
+        return timed_request("defectdojo", self.session, method, self.url(path), headers=headers, **kwargs)
+
+    def get(self, path, token=None, **kwargs):
+        if self.cache is None:
+            return self.request("GET", path, token=token, **kwargs)
+
+        url = self.url(path)
+        key = self.cache.key(url, kwargs.get("params"), token)
+        entry = self.cache.get(key)
+        if entry is not None and entry.fresh():
+            self.cache.count("hits")
+            return entry.response()
+        if entry is not None:
+            kwargs["headers"] = {**entry.validators(), **(kwargs.get("headers") or {})}
+        response = self.request("GET", url, token=token, **kwargs)
+        if entry is not None and response.status_code == 304:
+            self.cache.count("revalidated")
+            self.cache.refresh(key, entry, response)
+            return entry.response()
+        self.cache.count("misses")
+        self.cache.store(key, response)
+        return response
+
+    def post(self, path, token=None, **kwargs):
+        response = self.request("POST", path, token=token, **kwargs)
+        if self.cache is not None:
+            # Also on errors: a 400 for an existing name means the cached
+            # listing missed something
+            self.cache.invalidate(self.url(path).split("?")[0])
+        return response
+
+    def close(self):
+        self.session.close()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_dojo_client(url, pool_size=None):
+    # One shared client per DefectDojo instance; pool_size only applies to
+    # the call that creates it
+    url = url.rstrip("/")
+    with _clients_lock:
+        if url not in _clients:
+            _clients[url] = DojoClient(url, pool_size=pool_size or DEFAULT_POOL_SIZE, cache=ResponseCache())
+        return _clients[url]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_import import DEFAULT_SCAN_TYPE, bulk_import, find_reports, load_mapping, resolve_product_type, resolve_target
+from defectdojo import CHUNK_ISSUES, CHUNK_MB
+from dojo_client import DEFAULT_POOL_SIZE, get_dojo_client
+from findings_dedupe import DEDUPE_SCOPE, DEDUPE_SCOPES
+
+SHARDS_FILE = os.environ.get("DOJO_SHARDS")
+
+ROUTE_HASH = "hash"
+ROUTE_PRODUCT_TYPE = "product_type"
+ROUTES = (ROUTE_HASH, ROUTE_PRODUCT_TYPE)
+
+class Shard:
+    def __init__(self, name, url, token, pool_size=DEFAULT_POOL_SIZE, concurrency=4, product_types=()):
+        self.name = name
+        self.url = url.rstrip("/")
+        self.token = token
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.product_types = set(product_types)
+
+class ShardRouter:
+    # Picks the DefectDojo instance a product lives on. hash uses rendezvous
+    # hashing of the product name, so a product always lands on the same
+    # instance and adding one only moves the products it wins. product_type
+    # sends a product to the shard listing its type, and falls back to the
+    # hash for types no shard lists.
+    def __init__(self, shards, route=ROUTE_HASH):
+        if not shards:
+            raise ValueError("At least one DefectDojo shard is required")
+        self.shards = shards
+        self.route_by = route
+
+    def route(self, product_name, product_type=None):
+        if self.route_by == ROUTE_PRODUCT_TYPE and product_type is not None:
+            for shard in self.shards:
+                if product_type in shard.product_types:
+                    return shard
+        return max(self.shards, key=lambda shard: hashlib.sha256(f"{shard.name}|{product_name}".encode()).digest())
+
+def load_shards(path=SHARDS_FILE):
+    # JSON of the form {"route": "hash", "shards": [{"name": ..., "url": ...,
+    # "token": ... or "token_env": <variable holding it>, "pool_size": ...,
+    # "concurrency": ..., "product_types": [...]}, ...]}
+    with open(path) as f:
+        config = json.load(f)
+    route = config.get("route", ROUTE_HASH)
+    if route not in ROUTES:
+        raise ValueError(f"Unknown shard route '{route}', expected one of {', '.join(ROUTES)}")
+
+    shards = []
+    for i, entry in enumerate(config.get("shards", [])):
+        token = entry.get("token") or os.environ.get(entry.get("token_env", ""))
+        missing = [k for k, v in (("url", entry.get("url")), ("token", token)) if not v]
+        if missing:
+            raise ValueError(f"Shard {i} is missing {', '.join(missing)}")
+        shards.append(Shard(entry.get("name") or entry["url"], entry["url"], token, entry.get("pool_size", DEFAULT_POOL_SIZE),
+                            entry.get("concurrency", 4), entry.get("product_types", ())))
+    return ShardRouter(shards, route)
+
+def sharded_import(router, paths, rules, product=None, engagement="{name}", scan_type=DEFAULT_SCAN_TYPE, skip_unchanged=True,
+                   dedupe=DEDUPE_SCOPE, chunk_issues=CHUNK_ISSUES, chunk_mb=CHUNK_MB):
+    # Routes every report to its shard and runs one bulk import per shard,
+    # all at once. Each shard has its own connection pool and runs at most
+    # its concurrency requests, so a slow instance only holds up its own
+    # reports.
+    records = []
+    groups = {}
+    for path in paths:
+        target = resolve_target(path, rules, product, engagement)
+        if target is None:
+            records.append({"file": path, "product": None, "engagement": None, "status": None, "shard": None,
+                            "error": "No mapping rule matches this file", "seconds": 0})
+            continue
+        shard = router.route(target[0], resolve_product_type(path, rules))
+        groups.setdefault(shard, []).append(path)
+
+    def run(shard, shard_paths):
+        # The first get_dojo_client call for a URL sets its pool size
+        get_dojo_client(shard.url, pool_size=shard.pool_size)
+        shard_records = bulk_import(shard.token, shard.url, shard_paths, rules, product, engagement, scan_type,
+                                    shard.concurrency, skip_unchanged, dedupe, chunk_issues, chunk_mb)
+        for record in shard_records:
+            record["shard"] = shard.name
+        return shard_records
+
+    if groups:
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            for shard_records in pool.map(lambda item: run(*item), groups.items()):
+                records.extend(shard_records)
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Import scan reports into several DefectDojo instances in parallel")
+    parser.add_argument("source", help="Directory of XML reports or a glob pattern")
+    parser.add_argument("--shards", default=SHARDS_FILE, help="JSON shard configuration (default: DOJO_SHARDS)")
+    parser.add_argument("--mapping", help="CSV or JSON rules mapping file name patterns to product/engagement/product_type")
+    parser.add_argument("--product", help="Product for files no rule matches; {name} is the report name")
+    parser.add_argument("--engagement", default="{name}", help="Engagement name; {name} is the report name")
+    parser.add_argument("--scan-type", default=DEFAULT_SCAN_TYPE, help="DefectDojo scan type")
+    parser.add_argument("--results", help="File the per-file result records are written to as JSON lines")
+    parser.add_argument("--force", action="store_true", help="Upload reports even if their findings are unchanged")
+    parser.add_argument("--dedupe", choices=DEDUPE_SCOPES, default=DEDUPE_SCOPE, help="See bulk_import.py")
+    parser.add_argument("--chunk-issues", type=int, default=CHUNK_ISSUES, help="See bulk_import.py")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB, help="See bulk_import.py")
+    parser.add_argument("--plan", action="store_true", help="Only print the shard each report would go to")
+    args = parser.parse_args()
+    if not args.shards:
+        parser.error("--shards or DOJO_SHARDS is required")
+
+    try:
+        router = load_shards(args.shards)
+        rules = load_mapping(args.mapping) if args.mapping else []
+    except (OSError, ValueError) as e:
+        print(f"Error loading configuration: {e}")
+        sys.exit(1)
+    paths = find_reports(args.source)
+    if not paths:
+        print(f"No reports found in {args.source}")
+        sys.exit(1)
+
+    if args.plan:
+        for path in paths:
+            target = resolve_target(path, rules, args.product, args.engagement)
+            shard = router.route(target[0], resolve_product_type(path, rules)) if target else None
+            print(f"{path}\t{target[0] if target else '-'}\t{shard.name if shard else 'no mapping rule'}")
+        return
+
+    start = time.time()
+    records = sharded_import(router, paths, rules, args.product, args.engagement, args.scan_type, not args.force,
+                             args.dedupe, args.chunk_issues, args.chunk_mb)
+    failed = [r for r in records if r["error"]]
+
+    if args.results:
+        with open(args.results, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    for shard in router.shards:
+        shard_records = [r for r in records if r.get("shard") == shard.name]
+        if shard_records:
+            print(f"{shard.name}: {len(shard_records)} reports, {len([r for r in shard_records if r['error']])} failed")
+    print(f"Processed {len(records)} reports on {len(router.shards)} instances in {time.time() - start:.1f}s, {len(failed)} failed")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
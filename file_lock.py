@@ -0,0 +1,41 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    # Exclusive advisory lock on a lock file, shared between processes
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        lock_dir = os.path.dirname(self.path)
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+from appscan_report import iter_findings, start_tag
+
+DEFAULT_INDEX_PATH = os.environ.get("DOJO_FINDING_INDEX", os.path.expanduser("~/.cache/defectdojo/findings.sqlite3"))
+
+# Findings are unique per DefectDojo product, which matches DefectDojo's own
+# deduplication, or per instance when the same components show up across
+# products; off uploads every report as it is
+DEDUPE_OFF = "off"
+DEDUPE_PRODUCT = "product"
+DEDUPE_GLOBAL = "global"
+DEDUPE_SCOPES = (DEDUPE_OFF, DEDUPE_PRODUCT, DEDUPE_GLOBAL)
+DEDUPE_SCOPE = os.environ.get("DOJO_DEDUPE", DEDUPE_OFF)
+# Days a finding is left out after its upload. The index never sees a finding
+# closed or deleted in DefectDojo, so one that comes back is only reported
+# again once its entry has expired; 0 keeps entries forever.
+FINDING_TTL = float(os.environ.get("DOJO_FINDING_TTL_DAYS", "30")) * 24 * 60 * 60
+DEDUPE_HELP = ("Leave out findings uploaded to the same product, or to any product (global), within the last "
+               "DOJO_FINDING_TTL_DAYS (30) days. Findings closed in DefectDojo meanwhile stay left out until then; "
+               "findings_dedupe.py --reset forgets an instance's or product's uploads")
+
+FINGERPRINT_FIELDS = ("issue_type", "url", "parameter", "cwe")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    scope TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (scope, fingerprint)
+) WITHOUT ROWID;
+"""
+
+def normalize_url(url):
+    # Same resource, same string: lowercase scheme and host, no default
+    # port, fragment or trailing slash, and only the names of query
+    # parameters, sorted
+    if not url:
+        return ""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") or "/"
+    names = sorted({name for name, _ in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)})
+    query = "&".join(names)
+    return urllib.parse.urlunsplit((scheme, host, path, query, ""))
+
+def finding_fingerprint(finding):
+    values = [finding.get(field) or "" for field in FINGERPRINT_FIELDS]
+    values[1] = normalize_url(values[1])
+    return hashlib.sha256("\0".join(values).encode()).hexdigest()[:32]
+
+def dedupe_scope(scope, url, product_name):
+    if scope == DEDUPE_GLOBAL:
+        return url.rstrip("/")
+    return f"{url.rstrip('/')}|{product_name}"
+
+class FindingIndex:
+    # Fingerprints of every finding uploaded per scope within the last ttl
+    # seconds. Concurrent imports claim fingerprints before uploading, so a
+    # finding shared by reports of the same batch goes up with exactly one
+    # of them; the claim is committed once that upload succeeded and
+    # released if it failed.
+    def __init__(self, path=DEFAULT_INDEX_PATH, ttl=FINDING_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.findings = 0
+        self.kept = 0
+        self.reports = 0
+        index_dir = os.path.dirname(path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if ttl > 0:
+                conn.execute("DELETE FROM findings WHERE first_seen < ?", (time.time() - ttl,))
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def claim(self, scope, fingerprints):
+        # The fingerprints not uploaded nor claimed before, now claimed
+        fingerprints = list(dict.fromkeys(fingerprints))
+        cutoff = time.time() - self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            pending = self._pending.setdefault(scope, set())
+            known = set()
+            conn = self._connect()
+            try:
+                # Queried in chunks below SQLite's variable limit
+                for i in range(0, len(fingerprints), 500):
+                    chunk = fingerprints[i:i + 500]
+                    rows = conn.execute(
+                        f"SELECT fingerprint FROM findings WHERE scope = ? AND first_seen >= ? "
+                        f"AND fingerprint IN ({','.join('?' * len(chunk))})",
+                        (scope, cutoff, *chunk))
+                    known.update(row[0] for row in rows)
+            finally:
+                conn.close()
+            claimed = [fp for fp in fingerprints if fp not in known and fp not in pending]
+            pending.update(claimed)
+            return set(claimed)
+
+    def commit(self, scope, fingerprints):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    # Uploaded again after expiring: the expiry starts over
+                    conn.executemany("INSERT OR REPLACE INTO findings (scope, fingerprint, first_seen) VALUES (?, ?, ?)",
+                                     [(scope, fp, now) for fp in fingerprints])
+            finally:
+                conn.close()
+            self._pending.get(scope, set()).difference_update(fingerprints)
+
+    def release(self, scope, fingerprints):
+        with self._lock:
+            self._pending.get(scope, set()).difference_update(fingerprints)
+
+    def reset(self, scope):
+        # Forgets the uploads of scope, and of every product scope under it
+        # when scope is an instance URL; returns how many were dropped
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    deleted = conn.execute("DELETE FROM findings WHERE scope = ? OR substr(scope, 1, ?) = ?",
+                                           (scope, len(scope) + 1, scope + "|")).rowcount
+            finally:
+                conn.close()
+            for pending_scope in list(self._pending):
+                if pending_scope == scope or pending_scope.startswith(scope + "|"):
+                    del self._pending[pending_scope]
+            return deleted
+
+    def count(self, findings, kept):
+        with self._lock:
+            self.reports += 1
+            self.findings += findings
+            self.kept += kept
+
+    def stats(self):
+        with self._lock:
+            duplicates = self.findings - self.kept
+            return {"reports": self.reports, "findings": self.findings, "kept": self.kept, "duplicates": duplicates,
+                    "ratio": duplicates / self.findings if self.findings else 0.0}
+
+def write_report(source, dest, drop_ids):
+    # Streams the report into dest without the issue items in drop_ids.
+    # Every item of a top-level group is written out whole as soon as it
+    # has been parsed and then dropped, so memory stays flat like in
+    # iter_findings.
+    stack = []
+    group_open = False
+    with open(dest, "wb") as out:
+        out.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if not stack:
+                    out.write(start_tag(elem))
+                elif len(stack) == 2 and not group_open:
+                    out.write(start_tag(stack[1]))
+                    group_open = True
+                stack.append(elem)
+                if len(stack) == 2:
+                    group_open = False
+                continue
+
+            stack.pop()
+            elem.tail = None
+            if not stack:
+                out.write(f"</{elem.tag}>\n".encode())
+            elif len(stack) == 1:
+                if group_open:
+                    out.write(f"</{elem.tag}>\n".encode())
+                else:
+                    # No children, e.g. a text-only header element
+                    out.write(ET.tostring(elem, encoding="unicode").encode() + b"\n")
+                stack[0].remove(elem)
+            elif len(stack) == 2:
+                group = stack[1]
+                if not (group.tag == "issue-group" and elem.get("id") in drop_ids):
+                    out.write(ET.tostring(elem, encoding="unicode").encode() + b"\n")
+                group.remove(elem)
+
+def dedupe_report(path, scope, index):
+    # Claims the findings of the report that are new in the scope and, if
+    # any were already uploaded or occur twice, writes a copy without them
+    # next to the report. Returns the file to upload, or None when nothing
+    # is new, and the claimed fingerprints to commit or release.
+    try:
+        findings = [(finding["id"], finding_fingerprint(finding)) for finding in iter_findings(path)]
+    except ET.ParseError:
+        # Not an AppScan XML report, uploaded as it is
+        return path, set()
+
+    claimed = index.claim(scope, [fp for _, fp in findings])
+    drop_ids = set()
+    kept = set()
+    for finding_id, fp in findings:
+        if fp in claimed and fp not in kept:
+            kept.add(fp)
+        elif finding_id is not None:
+            drop_ids.add(finding_id)
+    index.count(len(findings), len(findings) - len(drop_ids))
+
+    if findings and not kept:
+        return None, claimed
+    if not drop_ids:
+        return path, claimed
+    root, ext = os.path.splitext(path)
+    deduped_path = f"{root}.dedupe{ext}"
+    try:
+        write_report(path, deduped_path, drop_ids)
+    except Exception:
+        index.release(scope, claimed)
+        raise
+    print(f"{path}: {len(drop_ids)} of {len(findings)} findings already uploaded or repeated, removed before upload")
+    return deduped_path, claimed
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_finding_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FindingIndex()
+        return _index
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how many findings of AppScan XML reports are duplicates")
+    parser.add_argument("reports", nargs="*", help="AppScan XML reports, in upload order")
+    parser.add_argument("--per-report", action="store_true", help="Print the duplicates of every report")
+    parser.add_argument("--reset", metavar="DOJO_URL",
+                        help="Forget the uploads recorded for this DefectDojo instance, so every finding is uploaded again")
+    parser.add_argument("--product", help="With --reset, only forget the uploads to this product")
+    args = parser.parse_args()
+
+    if args.reset:
+        scope = dedupe_scope(DEDUPE_PRODUCT, args.reset, args.product) if args.product else args.reset.rstrip("/")
+        deleted = get_finding_index().reset(scope)
+        print(f"Forgot {deleted} uploaded findings of {scope}")
+        return
+    if not args.reports:
+        parser.error("reports are required unless --reset is given")
+
+    # Dry run: only these reports count, the upload index is not read or changed
+    seen = set()
+    total = kept = 0
+    for path in args.reports:
+        try:
+            fingerprints = [finding_fingerprint(finding) for finding in iter_findings(path)]
+        except (OSError, ET.ParseError) as e:
+            print(f"{path}: {e}")
+            sys.exit(1)
+        new = set(fingerprints) - seen
+        seen.update(new)
+        total += len(fingerprints)
+        kept += len(new)
+        if args.per_report:
+            print(json.dumps({"report": path, "findings": len(fingerprints), "kept": len(new),
+                              "duplicates": len(fingerprints) - len(new)}))
+    ratio = (total - kept) / total if total else 0
+    print(f"{len(args.reports)} reports, {total} findings, {kept} unique, {total - kept} duplicates ({ratio:.1%})")
+
+if __name__ == "__main__":
+    main()
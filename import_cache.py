@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+
+from appscan_report import iter_findings
+
+DEFAULT_CACHE_PATH = os.environ.get("DOJO_IMPORT_CACHE", os.path.expanduser("~/.cache/defectdojo/imports.json"))
+
+# Finding fields that change between scans of an unchanged application
+VOLATILE_FIELDS = ("id",)
+
+def report_fingerprint(path):
+    # Order-independent hash of the normalized findings of a report: the sum
+    # of the per-finding hashes, so it is computed in one streaming pass.
+    # Reports that are not AppScan XML fall back to a hash of the raw file.
+    total = 0
+    count = 0
+    try:
+        for finding in iter_findings(path):
+            stable = {k: v for k, v in finding.items() if k not in VOLATILE_FIELDS}
+            digest = hashlib.sha256(json.dumps(stable, sort_keys=True).encode()).digest()
+            total = (total + int.from_bytes(digest, "big")) % (1 << 256)
+            count += 1
+    except ET.ParseError:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return "raw:" + digest.hexdigest()
+    return f"findings:{count}:{total:064x}"
+
+class ImportSkipCache:
+    # Last imported fingerprint per DefectDojo instance, product, engagement
+    # and scan type, kept on disk so unchanged reports are not uploaded again
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    @staticmethod
+    def key(url, product_name, engagement_name, scan_type):
+        return "|".join((url.rstrip("/"), product_name, engagement_name, scan_type))
+
+    def unchanged(self, key, fingerprint):
+        with self._lock:
+            if self._entries.get(key) == fingerprint:
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def record(self, key, fingerprint):
+        with self._lock:
+            self._entries[key] = fingerprint
+            self._save(key)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, key):
+        if not self.path:
+            return
+        try:
+            cache_dir = os.path.dirname(self.path) or "."
+            os.makedirs(cache_dir, exist_ok=True)
+            # Only this key changes, entries other runs wrote meanwhile are kept
+            entries = self._load()
+            entries[key] = self._entries[key]
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write import cache {self.path}: {e}")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_import_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImportSkipCache()
+        return _cache
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_STORE_PATH = os.environ.get("ASOC_JOB_STORE", os.path.expanduser("~/.cache/asoc/jobs.sqlite3"))
+
+# Phases a scan job moves through; done and failed are terminal
+PHASE_POLLING = "polling"
+PHASE_GENERATING = "generating"
+PHASE_DOWNLOADING = "downloading"
+PHASE_DONE = "done"
+PHASE_FAILED = "failed"
+TERMINAL_PHASES = (PHASE_DONE, PHASE_FAILED)
+
+# One row per scan execution; incremental executions share their
+# baseline's scan id
+JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scan_id TEXT NOT NULL,
+    app_id TEXT NOT NULL,
+    target_url TEXT,
+    scan_name TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    report_id TEXT,
+    report_path TEXT,
+    error TEXT,
+    incremental INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+JOB_COLUMNS = "scan_id, app_id, target_url, scan_name, phase, report_id, report_path, error, incremental, created, updated"
+
+SCHEMA = JOBS_TABLE + """
+CREATE INDEX IF NOT EXISTS jobs_scan ON jobs (scan_id);
+CREATE TABLE IF NOT EXISTS baselines (
+    app_id TEXT PRIMARY KEY,
+    scan_id TEXT NOT NULL,
+    target_url TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scan_durations (
+    app_id TEXT NOT NULL,
+    incremental INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scan_durations_app ON scan_durations (app_id, incremental, finished);
+"""
+
+JOB_FIELDS = ("report_id", "report_path", "error")
+
+class JobStore:
+    # Durable record of every scan started, so that a process dying while it
+    # waits on a scan can be resumed at the same phase without a new scan
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        store_dir = os.path.dirname(path)
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Stores created before incremental scans existed
+            columns = [row["name"] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "incremental" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN incremental INTEGER NOT NULL DEFAULT 0")
+            # Stores keyed on scan_id, where an incremental execution replaced its baseline's job
+            if "job_id" not in columns:
+                conn.executescript(
+                    "ALTER TABLE jobs RENAME TO jobs_by_scan;" + JOBS_TABLE +
+                    f"INSERT INTO jobs ({JOB_COLUMNS}) SELECT {JOB_COLUMNS} FROM jobs_by_scan ORDER BY created;"
+                    "DROP TABLE jobs_by_scan;"
+                    "CREATE INDEX IF NOT EXISTS jobs_scan ON jobs (scan_id);"
+                )
+
+    def _connect(self):
+        # A short-lived connection per call, usable from any thread
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    return [dict(row) for row in conn.execute(sql, params)]
+            finally:
+                conn.close()
+
+    def add(self, scan_id, app_id, target_url, scan_name, report_path=None, incremental=False):
+        # Returns the id of the new job. Every execution gets its own, so an
+        # incremental run leaves its baseline's unfinished job in place.
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    cursor = conn.execute(
+                        "INSERT INTO jobs (scan_id, app_id, target_url, scan_name, phase, report_path, incremental, created, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (scan_id, app_id, target_url, scan_name, PHASE_POLLING, report_path, int(incremental), now, now),
+                    )
+                return cursor.lastrowid
+            finally:
+                conn.close()
+
+    def update(self, job_id, phase, **fields):
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        columns = ["phase = ?", "updated = ?"] + [f"{name} = ?" for name in fields]
+        self._execute(
+            f"UPDATE jobs SET {', '.join(columns)} WHERE job_id = ?",
+            (phase, time.time(), *fields.values(), job_id),
+        )
+
+    def get(self, job_id):
+        rows = self._execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def pending(self):
+        return self._execute(
+            f"SELECT * FROM jobs WHERE phase NOT IN ({', '.join('?' for _ in TERMINAL_PHASES)}) ORDER BY created",
+            TERMINAL_PHASES,
+        )
+
+    def all(self):
+        return self._execute("SELECT * FROM jobs ORDER BY created")
+
+    def get_baseline(self, app_id):
+        # Last successful full scan of the app
+        rows = self._execute("SELECT * FROM baselines WHERE app_id = ?", (app_id,))
+        return rows[0] if rows else None
+
+    def set_baseline(self, app_id, scan_id, target_url):
+        self._execute(
+            "INSERT OR REPLACE INTO baselines (app_id, scan_id, target_url, created) VALUES (?, ?, ?, ?)",
+            (app_id, scan_id, target_url, time.time()),
+        )
+
+    def record_duration(self, app_id, incremental, seconds):
+        # Time from start to completion of a successful scan
+        self._execute(
+            "INSERT INTO scan_durations (app_id, incremental, seconds, finished) VALUES (?, ?, ?, ?)",
+            (app_id, int(incremental), seconds, time.time()),
+        )
+
+    def durations(self, app_id, incremental, limit=50):
+        # Most recent first
+        rows = self._execute(
+            "SELECT seconds FROM scan_durations WHERE app_id = ? AND incremental = ? ORDER BY finished DESC LIMIT ?",
+            (app_id, int(incremental), limit),
+        )
+        return [row["seconds"] for row in rows]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
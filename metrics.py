@@ -0,0 +1,248 @@
+import atexit
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# Written when the process exits, if set: an OpenMetrics textfile (e.g. for
+# the node_exporter textfile collector) and a JSON summary of the run
+METRICS_FILE = os.environ.get("ASOC_METRICS_FILE")
+SUMMARY_FILE = os.environ.get("ASOC_METRICS_SUMMARY")
+
+# Upper bounds in seconds, wide enough for both HTTP calls and whole scans
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Path segments that look like ids (anything with a digit) are collapsed so
+# that every scan or report shares one series
+_ID_SEGMENT = re.compile(r"\d")
+
+def endpoint_label(url):
+    path = urlparse(url).path
+    segments = [s for s in path.split("/") if s]
+    if segments[:2] == ["api", "v2"]:
+        segments = segments[2:]
+    return "/".join("{id}" if _ID_SEGMENT.search(s) else s for s in segments) or "/"
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._phases = {}
+        self._sent = {}
+        self._received = {}
+        self._retries = {}
+
+    def observe_request(self, service, method, url, status, seconds, sent=0, received=0):
+        endpoint = endpoint_label(url)
+        with self._lock:
+            self._requests.setdefault((service, method, endpoint, str(status)), Histogram()).observe(seconds)
+            key = (service, endpoint)
+            self._sent[key] = self._sent.get(key, 0) + sent
+            self._received[key] = self._received.get(key, 0) + received
+
+    def observe_phase(self, phase, seconds, outcome="ok"):
+        with self._lock:
+            self._phases.setdefault((phase, outcome), Histogram()).observe(seconds)
+
+    def count_retry(self, service, reason):
+        with self._lock:
+            key = (service, reason)
+            self._retries[key] = self._retries.get(key, 0) + 1
+
+    def openmetrics(self):
+        lines = []
+        with self._lock:
+            lines += _histogram_lines(
+                "appscan_http_request_duration_seconds", "Latency of HTTP calls to ASoC and DefectDojo",
+                ("service", "method", "endpoint", "status"), self._requests)
+            lines += _counter_lines(
+                "appscan_http_sent_bytes", "Request body bytes sent", ("service", "endpoint"), self._sent)
+            lines += _counter_lines(
+                "appscan_http_received_bytes", "Response body bytes received", ("service", "endpoint"), self._received)
+            lines += _counter_lines(
+                "appscan_http_retries", "HTTP calls repeated after a failure", ("service", "reason"), self._retries)
+            lines += _histogram_lines(
+                "appscan_phase_duration_seconds", "Time spent in each phase of a scan job",
+                ("phase", "outcome"), self._phases)
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        with self._lock:
+            phases = {}
+            for (phase, outcome), h in self._phases.items():
+                merged, errors = phases.get(phase, (Histogram(), 0))
+                merged.merge(h)
+                phases[phase] = (merged, errors + (h.count if outcome != "ok" else 0))
+
+            requests = {}
+            for (service, method, endpoint, status), h in self._requests.items():
+                key = (service, method, endpoint)
+                merged, errors = requests.get(key, (Histogram(), 0))
+                merged.merge(h)
+                failed = not status.isdigit() or int(status) >= 400
+                requests[key] = (merged, errors + (h.count if failed else 0))
+
+            request_summary = {}
+            for (service, method, endpoint), (h, errors) in requests.items():
+                entry = _summarize(h, errors)
+                entry["sent_bytes"] = self._sent.get((service, endpoint), 0)
+                entry["received_bytes"] = self._received.get((service, endpoint), 0)
+                request_summary[f"{service} {method} {endpoint}"] = entry
+
+            return {
+                "started": self.started,
+                "duration": round(time.time() - self.started, 3),
+                # Largest total first, so whatever dominates the run leads
+                "phases": _by_total({phase: _summarize(h, errors) for phase, (h, errors) in phases.items()}),
+                "requests": _by_total(request_summary),
+                "retries": {f"{service} {reason}": count for (service, reason), count in self._retries.items()},
+            }
+
+    def write(self, metrics_file=None, summary_file=None):
+        if metrics_file:
+            _write_atomic(metrics_file, self.openmetrics())
+        if summary_file:
+            _write_atomic(summary_file, json.dumps(self.summary(), indent=2) + "\n")
+
+def _summarize(h, errors):
+    return {
+        "count": h.count,
+        "errors": errors,
+        "seconds": round(h.sum, 3),
+        "mean_seconds": round(h.sum / h.count, 3) if h.count else 0,
+        "p95_seconds": h.quantile(0.95),
+        "max_seconds": round(h.max, 3),
+    }
+
+def _by_total(entries):
+    return dict(sorted(entries.items(), key=lambda item: -item[1]["seconds"]))
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _histogram_lines(name, help_text, label_names, series):
+    lines = [f"# TYPE {name} histogram", f"# HELP {name} {help_text}", f"# UNIT {name} seconds"]
+    for labels, h in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, h.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(label_names, labels, [('le', float(bound))])} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(label_names, labels, [('le', '+Inf')])} {h.count}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {h.count}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {h.sum:.6f}")
+    return lines
+
+def _counter_lines(name, help_text, label_names, series):
+    lines = [f"# TYPE {name} counter", f"# HELP {name} {help_text}"]
+    for labels, value in sorted(series.items()):
+        lines.append(f"{name}_total{_labels(label_names, labels)} {value}")
+    return lines
+
+def _write_atomic(path, text):
+    try:
+        target_dir = os.path.dirname(path) or "."
+        os.makedirs(target_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write metrics to {path}: {e}")
+
+@contextlib.contextmanager
+def phase(name):
+    # Times the block (or, as a decorator, each call) as one run of the
+    # phase; an exception or sys.exit counts it as an error
+    start = time.monotonic()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        get_metrics().observe_phase(name, time.monotonic() - start, outcome)
+
+def timed_request(service, session, method, url, **kwargs):
+    # session.request with its latency, status and body sizes recorded
+    start = time.monotonic()
+    try:
+        response = session.request(method, url, **kwargs)
+    except Exception:
+        get_metrics().observe_request(service, method, url, "error", time.monotonic() - start, _body_size(kwargs))
+        raise
+    length = response.headers.get("Content-Length")
+    received = int(length) if length and length.isdigit() else 0
+    get_metrics().observe_request(service, method, url, response.status_code, time.monotonic() - start,
+                                  _body_size(kwargs), received)
+    return response
+
+def _body_size(kwargs):
+    for key in ("data", "json"):
+        body = kwargs.get(key)
+        if body is None:
+            continue
+        if key == "json":
+            return len(json.dumps(body))
+        try:
+            return len(body)
+        except TypeError:
+            # Generator bodies, e.g. a gzipped upload, have no size up front
+            return 0
+    return 0
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
+
+@atexit.register
+def _write_at_exit():
+    if _metrics is not None and (METRICS_FILE or SUMMARY_FILE):
+        _metrics.write(METRICS_FILE, SUMMARY_FILE)
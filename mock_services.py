@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from bench_report_parser import write_synthetic_report
+from report_profiles import REPORT_SECTIONS
+
+# Stand-in for the ASoC and DefectDojo APIs these scripts call, both served
+# under /api/v2 on one port. Point ASOC_BASE_URL at <url>/api/v2 and pass
+# <url> as the DefectDojo URL. /_mock/stats returns request counters and
+# /_mock/reset clears them.
+
+class MockState:
+    def __init__(self):
+        # Handlers answer after releasing it: sending takes it to count the bytes
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.errors = 0
+        self.throttled = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.logins = 0
+        self.scans = {}
+        self.reports = {}
+        self.products = {}
+        self.engagements = 0
+        self.imports = 0
+        self.reimports = 0
+        # Tests created by import-scan, by id
+        self.tests = {}
+        self.not_modified = 0
+        # Bearer tokens answered with 401, as if expired or revoked
+        self.revoked = set()
+
+    def count(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "endpoints": dict(self.requests),
+                "errors": self.errors,
+                "throttled": self.throttled,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "logins": self.logins,
+                "scans": len(self.scans),
+                "reports": len(self.reports),
+                "products": len(self.products),
+                "engagements": self.engagements,
+                "imports": self.imports,
+                "reimports": self.reimports,
+                "tests": len(self.tests),
+                "not_modified": self.not_modified,
+            }
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # (method, path pattern, endpoint); each endpoint is served by _<endpoint>
+    ROUTES = (
+        ("POST", r"/api/v2/Account/ApiKeyLogin", "login"),
+        ("POST", r"/api/v2/Scans/DynamicAnalyzer", "start_scan"),
+        ("GET", r"/api/v2/Scans/DynamicAnalyzer/([^/]+)", "scan_status"),
+        ("POST", r"/api/v2/Scans/([^/]+)/Executions", "start_execution"),
+        ("GET", r"/api/v2/Scans", "scan_list"),
+        ("POST", r"/api/v2/Reports/Security/Scan/([^/]+)", "generate_report"),
+        ("GET", r"/api/v2/Reports/Download/([^/]+)", "download_report"),
+        ("GET", r"/api/v2/Reports/([^/]+)", "report_status"),
+        ("GET", r"/api/v2/products/", "list_products"),
+        ("POST", r"/api/v2/products/", "create_product"),
+        ("POST", r"/api/v2/engagements/", "create_engagement"),
+        ("POST", r"/api/v2/import-scan/", "import_scan"),
+        ("POST", r"/api/v2/reimport-scan/", "reimport_scan"),
+        ("GET", r"/api/v2/tests/", "list_tests"),
+    )
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        self.query = parse_qs(parsed.query)
+        self.body = self._read_body()
+        if parsed.path == "/_mock/stats":
+            return self._json(200, self.server.state.stats())
+        if parsed.path == "/_mock/reset":
+            self.server.reset()
+            return self._json(200, {})
+
+        route_method = "GET" if method == "HEAD" else method
+        for verb, pattern, endpoint in self.ROUTES:
+            match = re.fullmatch(pattern, parsed.path)
+            if verb == route_method and match:
+                break
+        else:
+            return self._json(404, {"detail": "Not found"})
+
+        state = self.server.state
+        state.count(endpoint)
+        self.server.delay()
+        if endpoint != "login":
+            if not self.headers.get("Authorization"):
+                return self._json(401, {"detail": "Authentication credentials were not provided."})
+            with state.lock:
+                revoked = self.headers["Authorization"].split()[-1] in state.revoked
+            if revoked or self.server.reject_tokens:
+                return self._json(401, {"Message": "Token expired"})
+            retry_after = self.server.throttle()
+            if retry_after:
+                with state.lock:
+                    state.throttled += 1
+                return self._send(429, b'{"Message": "Too many requests"}', "application/json",
+                                  {"Retry-After": str(retry_after)})
+            if self.server.fail_request(endpoint) or random.random() < self.server.error_rate:
+                with state.lock:
+                    state.errors += 1
+                return self._json(self.server.error_status, {"detail": "Injected error"})
+        getattr(self, "_" + endpoint)(*(unquote(g) for g in match.groups()))
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.server.state.lock:
+            self.server.state.bytes_in += len(body)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        if self.command == "GET" and status == 200:
+            # Conditional GETs get a 304 while the content is unchanged
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                with self.server.state.lock:
+                    self.server.state.not_modified += 1
+                return self._send(304, b"", "application/json", {"ETag": etag})
+            return self._send(status, body, "application/json", {"ETag": etag})
+        self._send(status, body, "application/json")
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+            with self.server.state.lock:
+                self.server.state.bytes_out += len(body)
+
+    def _login(self):
+        state = self.server.state
+        with state.lock:
+            state.logins += 1
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600))
+        self._json(200, {"Token": uuid.uuid4().hex, "Expire": expires})
+
+    def _start_scan(self):
+        state = self.server.state
+        with state.lock:
+            scan_id = f"scan{len(state.scans) + 1}"
+            state.scans[scan_id] = time.time()
+        self._json(201, {"Id": scan_id})
+
+    def _start_execution(self, scan_id):
+        state = self.server.state
+        with state.lock:
+            found = scan_id in state.scans
+            if found:
+                state.scans[scan_id] = time.time()
+        if not found:
+            return self._json(404, {"Message": "Scan not found"})
+        self._json(201, {"Id": uuid.uuid4().hex, "ScanId": scan_id})
+
+    def _scan_json(self, scan_id):
+        started = self.server.state.scans[scan_id]
+        done = time.time() - started >= self.server.scan_seconds
+        return {
+            "Id": scan_id,
+            "LatestExecution": {
+                "ExecutionProgress": "Completed" if done else "Running",
+                "NHighIssues": 1 if done else 0,
+                "NMediumIssues": 2 if done else 0,
+                "NLowIssues": 3 if done else 0,
+                "ErrorMessage": None,
+                "ExecutionDurationSec": self.server.scan_seconds if done else None,
+            },
+        }
+
+    def _scan_status(self, scan_id):
+        if scan_id not in self.server.state.scans:
+            return self._json(404, {"Message": "Scan not found"})
+        self._json(200, self._scan_json(scan_id))
+
+    def _scan_list(self):
+        query = self.query.get("$filter", [""])[0]
+        ids = re.findall(r"Id eq '([^']+)'", query)
+        self._json(200, [self._scan_json(scan_id) for scan_id in ids if scan_id in self.server.state.scans])
+
+    def _generate_report(self, scan_id):
+        state = self.server.state
+        configuration = json.loads(self.body or b"{}").get("Configuration", {})
+        sections = sum(1 for name in REPORT_SECTIONS if configuration.get(name)) or len(REPORT_SECTIONS)
+        with state.lock:
+            report_id = None
+            if scan_id in state.scans:
+                report_id = f"report{len(state.reports) + 1}"
+                state.reports[report_id] = (time.time(), sections)
+        if report_id is None:
+            return self._json(404, {"Message": "Scan not found"})
+        self._json(200, {"Id": report_id})
+
+    def _report_status(self, report_id):
+        report = self.server.state.reports.get(report_id)
+        if report is None:
+            return self._json(404, {"Message": "Report not found"})
+        elapsed = time.time() - report[0]
+        ready = elapsed >= self.server.report_seconds
+        progress = 100 if ready else int(100 * elapsed / self.server.report_seconds)
+        self._json(200, {"Id": report_id, "Status": "Ready" if ready else "Running", "Progress": progress})
+
+    def _download_report(self, report_id):
+        report = self.server.state.reports.get(report_id)
+        if report is None or time.time() - report[0] < self.server.report_seconds:
+            return self._json(404, {"Message": "Report not ready"})
+        with open(self.server.report_file(report[1]), "rb") as f:
+            body = f.read()
+
+        status, headers = 200, {}
+        content_range = self.headers.get("Range")
+        if content_range:
+            start = int(content_range.split("=")[1].split("-")[0])
+            status, headers = 206, {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"}
+            body = body[start:]
+        elif self.server.gzip_downloads and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        if self.server.drop_download():
+            # Announce the whole body, send half and hang up
+            self.send_response(status)
+            self.send_header("Content-Type", "application/xml")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self._send(status, body, "application/xml", headers)
+
+    def _list_products(self):
+        name = self.query.get("name", [None])[0]
+        products = self.server.state.products
+        results = [{"id": pid, "name": n} for n, pid in products.items() if name is None or n == name]
+        self._json(200, {"count": len(results), "next": None, "previous": None, "results": results})
+
+    def _create_product(self):
+        data = json.loads(self.body)
+        state = self.server.state
+        with state.lock:
+            product_id = None
+            if data["name"] not in state.products:
+                state.products[data["name"]] = len(state.products) + 1
+                product_id = state.products[data["name"]]
+        if product_id is None:
+            return self._json(400, {"name": ["Product with this name already exists."]})
+        self._json(201, {"id": product_id, "name": data["name"]})
+
+    def _create_engagement(self):
+        data = json.loads(self.body)
+        state = self.server.state
+        with state.lock:
+            state.engagements += 1
+            engagement_id = state.engagements
+        self._json(201, {"id": engagement_id, "name": data.get("name"), "product": data.get("product")})
+
+    def _form_field(self, name):
+        match = re.search(b'name="%s"\r\n\r\n([^\r]*)' % name.encode(), self.body)
+        return match.group(1).decode() if match else None
+
+    def _import_scan(self):
+        # A stalled import still creates its test, after the client may have given up
+        time.sleep(self.server.import_seconds + self.server.stall_import())
+        state = self.server.state
+        engagement = self._form_field("engagement")
+        scan_type = self._form_field("scan_type")
+        with state.lock:
+            state.imports += 1
+            test_id = len(state.tests) + 1
+            state.tests[test_id] = {"id": test_id, "engagement": int(engagement) if engagement else None,
+                                    "scan_type": scan_type, "reimports": 0}
+        self._json(201, {"test": test_id, "test_id": test_id, "scan_type": scan_type})
+
+    def _reimport_scan(self):
+        time.sleep(self.server.import_seconds)
+        state = self.server.state
+        test_id = self._form_field("test")
+        test_id = int(test_id) if test_id else None
+        with state.lock:
+            state.reimports += 1
+            if test_id in state.tests:
+                state.tests[test_id]["reimports"] += 1
+        self._json(201, {"test": test_id, "test_id": test_id, "scan_type": self._form_field("scan_type")})
+
+    def _list_tests(self):
+        engagement = self.query.get("engagement", [None])[0]
+        with self.server.state.lock:
+            results = [dict(test) for test in self.server.state.tests.values()
+                       if engagement is None or str(test["engagement"]) == engagement]
+        for test in results:
+            del test["reimports"]
+        self._json(200, {"count": len(results), "next": None, "previous": None, "results": results})
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, host="127.0.0.1", latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, rate_limit=0.0,
+                 scan_seconds=1.0, report_seconds=0.0, report_size_mb=1.0, import_seconds=0.0, gzip_downloads=False,
+                 drop_downloads=0, verbose=False):
+        super().__init__((host, port), MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self._window = [0, 0]
+        self._throttle_lock = threading.Lock()
+        self.scan_seconds = scan_seconds
+        self.report_seconds = report_seconds
+        self.report_size_mb = report_size_mb
+        self.import_seconds = import_seconds
+        self.gzip_downloads = gzip_downloads
+        # Answer every authenticated call with 401, even after a new login
+        self.reject_tokens = False
+        # Answer this many of the next API calls (to fail_endpoint only, if
+        # set) with error_status
+        self.fail_requests = 0
+        self.fail_endpoint = None
+        # Delay this many of the next import-scans by stall_seconds
+        self.stall_imports = 0
+        self.stall_seconds = 0.0
+        self.drop_downloads = drop_downloads
+        self.verbose = verbose
+        self.state = MockState()
+        self.url = f"http://{host}:{self.server_address[1]}"
+        self._report_dir = tempfile.mkdtemp(prefix="mock_reports_")
+        self._report_files = {}
+        self._report_lock = threading.Lock()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+
+    def throttle(self):
+        # Seconds the client should wait (for Retry-After) once more than
+        # rate_limit requests arrived within the current second, else 0
+        if not self.rate_limit:
+            return 0
+        with self._throttle_lock:
+            second = int(time.time())
+            if self._window[0] != second:
+                self._window = [second, 0]
+            self._window[1] += 1
+            return 1 if self._window[1] > self.rate_limit else 0
+
+    def stall_import(self):
+        with self._throttle_lock:
+            if self.stall_imports <= 0:
+                return 0
+            self.stall_imports -= 1
+            return self.stall_seconds
+
+    def fail_request(self, endpoint):
+        with self._throttle_lock:
+            if self.fail_requests <= 0 or self.fail_endpoint not in (None, endpoint):
+                return False
+            self.fail_requests -= 1
+            return True
+
+    def drop_download(self):
+        # True for each of the first drop_downloads report downloads
+        with self._throttle_lock:
+            if self.drop_downloads <= 0:
+                return False
+            self.drop_downloads -= 1
+            return True
+
+    def reset(self):
+        self.state = MockState()
+
+    def report_file(self, sections):
+        # One synthetic report per number of sections requested, sized in
+        # proportion so that lean report profiles download less
+        with self._report_lock:
+            if sections not in self._report_files:
+                path = os.path.join(self._report_dir, f"report_{sections}.xml")
+                write_synthetic_report(path, self.report_size_mb * sections / len(REPORT_SECTIONS), urls=100)
+                self._report_files[sections] = path
+            return self._report_files[sections]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def server_close(self):
+        super().server_close()
+        shutil.rmtree(self._report_dir, ignore_errors=True)
+
+def add_mock_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second answered before 429 with Retry-After")
+    parser.add_argument("--scan-seconds", type=float, default=1.0, help="Seconds until a started scan completes")
+    parser.add_argument("--report-seconds", type=float, default=0.0, help="Seconds until a generated report can be downloaded")
+    parser.add_argument("--report-size-mb", type=float, default=1.0, help="Size of a report with every section")
+    parser.add_argument("--import-seconds", type=float, default=0.0, help="Seconds DefectDojo takes per import-scan")
+    parser.add_argument("--gzip-downloads", action="store_true", help="Serve report downloads gzip-encoded to clients that accept it")
+    parser.add_argument("--drop-downloads", type=int, default=0, help="Cut off this many report downloads halfway")
+
+def mock_options(args):
+    return {name: getattr(args, name) for name in (
+        "latency", "jitter", "error_rate", "error_status", "rate_limit", "scan_seconds", "report_seconds", "report_size_mb", "import_seconds",
+        "gzip_downloads", "drop_downloads",
+    )}
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-in ASoC and DefectDojo APIs for local testing and benchmarks")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on, 0 for any free port")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockServer(args.port, args.host, verbose=args.verbose, **mock_options(args))
+    print(f"Mock ASoC and DefectDojo listening on {server.url}", flush=True)
+    print(f"ASOC_BASE_URL={server.url}/api/v2", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
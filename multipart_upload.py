@@ -0,0 +1,67 @@
+import mimetypes
+import os
+import uuid
+import zlib
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class MultipartEncoder:
+    # multipart/form-data body that reads the file in chunks while it is
+    # sent, instead of building the whole body in memory the way
+    # requests.post(files=...) does. Pass the encoder (or gzipped()) as the
+    # data of the request; the file is closed once the body has been sent
+    # or close() is called.
+    def __init__(self, fields, file_field, file_path, filename=None, content_type=None, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self._chunks = None
+
+        filename = filename or os.path.basename(file_path)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        head = []
+        for name, value in fields.items():
+            head.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            )
+        head.append(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        )
+        self._head = "".join(head).encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.length = len(self._head) + os.path.getsize(file_path) + len(self._tail)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        self._chunks = self._iter_chunks()
+        return self._chunks
+
+    def _iter_chunks(self):
+        yield self._head
+        with open(self.file_path, "rb") as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield self._tail
+
+    def gzipped(self, level=6):
+        # Same body compressed on the fly, for a request sent with
+        # Content-Encoding: gzip. Its length is unknown up front, so it goes
+        # out with chunked transfer encoding.
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        for chunk in self:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def close(self):
+        # Closing the generator runs the with block, closing the file
+        if self._chunks is not None:
+            self._chunks.close()
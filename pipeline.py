@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asoc_client import ASoCClient, set_client
+from batch_scan import load_manifest
+from bulk_import import DEFAULT_SCAN_TYPE, bootstrap
+from dd1 import SCAN_MODE, SCAN_MODE_FULL, SCAN_MODES, get_token, start_scheduled_scan, generate_report, download_report_to_file
+from defectdojo import CHUNK_ISSUES, CHUNK_MB, import_scan_chunked
+from dojo_client import get_dojo_client
+from findings_dedupe import DEDUPE_HELP, DEDUPE_OFF, DEDUPE_SCOPE, DEDUPE_SCOPES, dedupe_report, dedupe_scope, get_finding_index
+from import_cache import get_import_cache, report_fingerprint
+from job_store import PHASE_DONE, PHASE_DOWNLOADING, PHASE_FAILED, PHASE_GENERATING, get_job_store
+from report_profiles import PROFILE_IMPORT, REPORT_PROFILES
+from scan_poller import ScanPoller
+from scan_schedule import expected_duration, scan_duration, scan_timeout
+
+def _checked(fn, *args, **kwargs):
+    # The dd1/defectdojo helpers print their error and sys.exit; turn that
+    # into an ordinary exception so one failed job does not stop the loop
+    try:
+        return fn(*args, **kwargs)
+    except SystemExit:
+        raise RuntimeError(f"{fn.__name__} failed")
+
+class Pipeline:
+    # scan start -> status wait -> report generation and download ->
+    # product/engagement bootstrap and import-scan, each stage a set of
+    # asyncio workers connected by bounded queues, so that many scans
+    # overlap across stages. The blocking HTTP helpers run in a thread pool.
+    def __init__(self, token, dojo_url, dojo_token, report_dir, max_scans=20, download_workers=4, import_workers=4,
+                 queue_size=10, scan_type=DEFAULT_SCAN_TYPE, max_time=None, poll_interval=30,
+                 keep_reports=False, skip_unchanged=True, mode=SCAN_MODE_FULL,
+                 report_profile=PROFILE_IMPORT, dedupe=DEDUPE_SCOPE, chunk_issues=CHUNK_ISSUES, chunk_mb=CHUNK_MB):
+        self.token = token
+        self.dojo_url = dojo_url
+        self.dojo_token = dojo_token
+        self.report_dir = report_dir
+        self.max_scans = max_scans
+        self.download_workers = download_workers
+        self.import_workers = import_workers
+        self.queue_size = queue_size
+        self.scan_type = scan_type
+        self.max_time = max_time
+        self.keep_reports = keep_reports
+        self.skip_unchanged = skip_unchanged
+        self.mode = mode
+        self.report_profile = report_profile
+        self.dedupe = dedupe
+        self.chunk_issues = chunk_issues
+        self.chunk_mb = chunk_mb
+        self.poller = ScanPoller(token, interval=poll_interval, workers=max_scans)
+        self.records = []
+        self._engagements = {}
+
+    async def run(self, jobs, on_record=None):
+        self.on_record = on_record
+        self.slots = asyncio.Semaphore(self.max_scans)
+        self.start_q = asyncio.Queue()
+        self.wait_q = asyncio.Queue(self.queue_size)
+        self.report_q = asyncio.Queue(self.queue_size)
+        self.import_q = asyncio.Queue(self.queue_size)
+
+        stages = [
+            (self.start_q, self._start, self.max_scans),
+            (self.wait_q, self._wait, self.max_scans),
+            (self.report_q, self._report, self.download_workers),
+            (self.import_q, self._import, self.import_workers),
+        ]
+        workers = [
+            asyncio.create_task(self._worker(queue, handler))
+            for queue, handler, count in stages
+            for _ in range(count)
+        ]
+
+        for job in jobs:
+            job.setdefault("error", None)
+            job["started"] = time.time()
+            self.start_q.put_nowait(job)
+
+        # Every job has left a stage before the next stage is drained
+        for queue, _, _ in stages:
+            await queue.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.poller.stop()
+        return self.records
+
+    async def _worker(self, queue, handler):
+        while True:
+            job = await queue.get()
+            try:
+                await handler(job)
+            except Exception as e:
+                job["error"] = str(e)
+                self._finish(job)
+            finally:
+                queue.task_done()
+
+    def _finish(self, job):
+        job["finished"] = time.time()
+        job["duration"] = round(job["finished"] - job["started"], 3)
+        print(f"[{job['scan_name']}] finished in {job['duration']}s" + (f" with error: {job['error']}" if job["error"] else ""))
+        self.records.append(job)
+        if self.on_record is not None:
+            self.on_record(job)
+
+    async def _start(self, job):
+        await self.slots.acquire()
+        try:
+            job["scan_id"], job["incremental"] = await asyncio.to_thread(
+                _checked, start_scheduled_scan, self.token, job["app_id"], job["target_url"], job["scan_name"],
+                job.get("mode") or self.mode)
+        except Exception:
+            self.slots.release()
+            raise
+        job["scan_started"] = time.time()
+        print(f"[{job['scan_name']}] DAST scan started. Scan ID: {job['scan_id']}")
+        # Recorded so resume.py can finish the scan and download its report
+        # if this process dies; reports in a temporary directory go to the
+        # working directory then, like dd1.py's
+        report_dir = self.report_dir if self.keep_reports else "."
+        job["job_id"] = get_job_store().add(job["scan_id"], job["app_id"], job["target_url"], job["scan_name"],
+                                            os.path.abspath(os.path.join(report_dir, f"{job['scan_name']}_report.xml")),
+                                            job["incremental"])
+        await self.wait_q.put(job)
+
+    async def _wait(self, job):
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def on_done(scan_id, status_obj):
+            loop.call_soon_threadsafe(lambda: done.done() or done.set_result(status_obj))
+
+        store = get_job_store()
+        eta = expected_duration(store, job["app_id"], job["incremental"])
+        max_time = self.max_time or scan_timeout(store, job["app_id"], job["incremental"])
+        self.poller.add(job["scan_id"], on_done, eta, job["scan_started"])
+        try:
+            status_obj = await asyncio.wait_for(done, max_time)
+        except asyncio.TimeoutError:
+            self.poller.remove(job["scan_id"], on_done)
+            job["status"] = "TimedOut"
+            raise RuntimeError(f"Scan timed out after {max_time / 60:.0f} minutes.")
+        finally:
+            self.slots.release()
+
+        job["status"] = status_obj["Status"]
+        if status_obj["Status"] != "Completed":
+            store.update(job["job_id"], PHASE_FAILED, error=status_obj["ErrorMessage"])
+            raise RuntimeError(status_obj["ErrorMessage"] or f"Scan ended with status {status_obj['Status']}")
+        job["high"] = status_obj["HighVulnerabilities"]
+        job["medium"] = status_obj["MediumVulnerabilities"]
+        job["low"] = status_obj["LowVulnerabilities"]
+        store.record_duration(job["app_id"], job["incremental"], scan_duration(status_obj, job["scan_started"], live=True))
+        if not job["incremental"]:
+            store.set_baseline(job["app_id"], job["scan_id"], job["target_url"])
+        store.update(job["job_id"], PHASE_GENERATING)
+        await self.report_q.put(job)
+
+    async def _report(self, job):
+        profile = job.get("report_profile") or self.report_profile
+        report_data = await asyncio.to_thread(_checked, generate_report, self.token, job["scan_id"], profile)
+        job["report_id"] = report_data["Id"]
+        get_job_store().update(job["job_id"], PHASE_DOWNLOADING, report_id=job["report_id"])
+        path = os.path.join(self.report_dir, f"{job['scan_name']}_report.xml")
+        report = await asyncio.to_thread(_checked, download_report_to_file, self.token, job["report_id"], path,
+                                         history_key=job["app_id"], profile=profile)
+        job["report_path"] = report["path"]
+        job["report_size"] = report["size"]
+        get_job_store().update(job["job_id"], PHASE_DONE)
+        await self.import_q.put(job)
+
+    async def _import(self, job):
+        target = (job["product"], job["engagement"])
+        upload_path = job["report_path"]
+        scope = dedupe_scope(self.dedupe, self.dojo_url, job["product"])
+        claimed = set()
+        try:
+            fingerprint = None
+            if self.skip_unchanged:
+                import_cache = get_import_cache()
+                cache_key = import_cache.key(self.dojo_url, *target, self.scan_type)
+                fingerprint = await asyncio.to_thread(report_fingerprint, job["report_path"])
+                if import_cache.unchanged(cache_key, fingerprint):
+                    job["import_status"] = "skipped"
+                    self._finish(job)
+                    return
+
+            if self.dedupe != DEDUPE_OFF:
+                upload_path, claimed = await asyncio.to_thread(dedupe_report, job["report_path"], scope, get_finding_index())
+                if upload_path is None:
+                    job["import_status"] = "duplicate"
+                    self._finish(job)
+                    return
+
+            # Jobs sharing a product/engagement bootstrap it once
+            if target not in self._engagements:
+                self._engagements[target] = asyncio.ensure_future(
+                    asyncio.to_thread(bootstrap, self.dojo_token, self.dojo_url, *target))
+            product_id, engagement_id = await self._engagements[target]
+
+            response = await asyncio.to_thread(
+                import_scan_chunked, self.dojo_token, product_id, engagement_id, upload_path, self.dojo_url, self.scan_type,
+                self.chunk_issues, self.chunk_mb)
+            job["import_status"] = response.status_code
+            if response.status_code != 201:
+                raise RuntimeError(f"import-scan failed: {response.text[:500]}")
+            if fingerprint is not None:
+                import_cache.record(cache_key, fingerprint)
+            if claimed:
+                get_finding_index().commit(scope, claimed)
+                claimed = set()
+            self._finish(job)
+        finally:
+            if claimed:
+                get_finding_index().release(scope, claimed)
+            if upload_path not in (None, job["report_path"]):
+                os.remove(upload_path)
+            if not self.keep_reports and os.path.exists(job["report_path"]):
+                os.remove(job["report_path"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan with AppScan and import the results into DefectDojo in one pipeline")
+    parser.add_argument("api_key", help="ASoC API Key")
+    parser.add_argument("api_secret", help="ASoC API Secret")
+    parser.add_argument("dojo_url", help="DefectDojo URL")
+    parser.add_argument("dojo_token", help="DefectDojo Authorization Token")
+    parser.add_argument("manifest", help="CSV or JSON manifest with app_id, target_url, scan_name and optionally product, engagement")
+    parser.add_argument("--product", default="{name}", help="Product for entries without one; {name} is the scan name")
+    parser.add_argument("--engagement", default="{name}", help="Engagement for entries without one; {name} is the scan name")
+    parser.add_argument("--scan-type", default=DEFAULT_SCAN_TYPE, help="DefectDojo scan type")
+    parser.add_argument("--max-scans", type=int, default=20, help="Maximum number of scans running at once")
+    parser.add_argument("--download-workers", type=int, default=4, help="Concurrent report generations/downloads")
+    parser.add_argument("--import-workers", type=int, default=4, help="Concurrent DefectDojo imports")
+    parser.add_argument("--queue-size", type=int, default=10, help="Capacity of the queues between stages")
+    parser.add_argument("--timeout", type=int, help="Per-scan timeout in seconds "
+                        "(default: from the app's past scan durations, or 30 minutes without history)")
+    parser.add_argument("--poll-interval", type=int, default=30, help="Seconds between status checks")
+    parser.add_argument("--report-dir", help="Keep the downloaded reports in this directory")
+    parser.add_argument("--results", default="pipeline_results.jsonl", help="File the per-scan result records are appended to")
+    parser.add_argument("--force", action="store_true", help="Import reports even if their findings are unchanged")
+    parser.add_argument("--mode", choices=SCAN_MODES, default=SCAN_MODE, help="full, incremental or auto scan scheduling, see batch_scan.py")
+    parser.add_argument("--report-profile", choices=REPORT_PROFILES, default=PROFILE_IMPORT,
+                        help="Report sections to generate; the default import profile has only what DefectDojo reads")
+    parser.add_argument("--dedupe", choices=DEDUPE_SCOPES, default=DEDUPE_SCOPE,
+                        help=DEDUPE_HELP)
+    parser.add_argument("--chunk-issues", type=int, default=CHUNK_ISSUES,
+                        help="Import reports with more issues than this in parallel chunks, see bulk_import.py")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_MB,
+                        help="Import reports with more megabytes of issues than this in parallel chunks")
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    for job in jobs:
+        job["product"] = job.get("product") or args.product.format(name=job["scan_name"])
+        job["engagement"] = job.get("engagement") or args.engagement.format(name=job["scan_name"])
+
+    threads = args.max_scans + args.download_workers + args.import_workers
+    set_client(ASoCClient(pool_size=threads))
+    get_dojo_client(args.dojo_url, pool_size=args.import_workers)
+    token = get_token(args.api_key, args.api_secret)
+
+    report_dir = args.report_dir or tempfile.mkdtemp(prefix="asoc_reports_")
+    os.makedirs(report_dir, exist_ok=True)
+    pipeline = Pipeline(token, args.dojo_url, args.dojo_token, report_dir, args.max_scans, args.download_workers,
+                        args.import_workers, args.queue_size, args.scan_type, args.timeout, args.poll_interval,
+                        keep_reports=args.report_dir is not None, skip_unchanged=not args.force, mode=args.mode,
+                        report_profile=args.report_profile, dedupe=args.dedupe, chunk_issues=args.chunk_issues,
+                        chunk_mb=args.chunk_mb)
+
+    async def run():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=threads))
+        with open(args.results, "a") as results:
+            def write(record):
+                results.write(json.dumps(record) + "\n")
+                results.flush()
+            return await pipeline.run(jobs, write)
+
+    start = time.time()
+    try:
+        records = asyncio.run(run())
+    finally:
+        if args.report_dir is None:
+            shutil.rmtree(report_dir, ignore_errors=True)
+    failed = [r for r in records if r["error"]]
+
+    print(f"{len(records)} scans processed in {time.time() - start:.1f}s, {len(failed)} failed. Results written to {args.results}")
+    if args.dedupe != DEDUPE_OFF:
+        dedupe = get_finding_index().stats()
+        print(f"Dedupe: {dedupe['duplicates']} of {dedupe['findings']} findings left out ({dedupe['ratio']:.1%})")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
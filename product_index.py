@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from dojo_client import get_dojo_client
+from metrics import phase
+
+DEFAULT_CACHE_PATH = os.environ.get("DOJO_PRODUCT_CACHE", os.path.expanduser("~/.cache/defectdojo/products.json"))
+DEFAULT_TTL = int(os.environ.get("DOJO_PRODUCT_CACHE_TTL", "3600"))
+
+class ProductIndex:
+    # name -> id index of the products of one DefectDojo instance, cached in
+    # memory and on disk for ttl seconds. Misses are resolved with the
+    # server-side name filter, following pagination, instead of scanning the
+    # first page of the full products listing.
+    def __init__(self, url, cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.url = url.rstrip("/")
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.lookups = 0
+        self._products = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(self, token, product_name):
+        product_id = self.cached(product_name)
+        if product_id is not None:
+            return product_id
+
+        product_id = self._lookup(token, product_name)
+        if product_id is not None:
+            self.add(product_name, product_id)
+        return product_id
+
+    def cached(self, product_name):
+        # The id if the cache has an entry younger than ttl, without any request
+        with self._lock:
+            entry = self._products.get(product_name)
+            if entry is not None and time.time() - entry[1] < self.ttl:
+                return entry[0]
+        return None
+
+    def add(self, product_name, product_id):
+        with self._lock:
+            self._products[product_name] = [product_id, time.time()]
+            self._save()
+
+    def invalidate(self, product_name=None):
+        with self._lock:
+            if product_name is None:
+                self._products.clear()
+            else:
+                self._products.pop(product_name, None)
+            self._save()
+
+    @phase("product_lookup")
+    def _lookup(self, token, product_name):
+        next_url = "api/v2/products/"
+        params = {"name": product_name, "limit": 100}
+        while next_url:
+            self.lookups += 1
+            response = get_dojo_client(self.url).get(next_url, token=token, params=params)
+            response.raise_for_status()
+            products = response.json()
+            for product in products.get("results", []):
+                if product["name"] == product_name:
+                    return product["id"]
+            # The next link already carries the query string
+            next_url = products.get("next")
+            params = None
+        return None
+
+    def _load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f).get(self.url, {})
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        self._products = {name: entry for name, entry in cached.items() if now - entry[1] < self.ttl}
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        try:
+            cache_dir = os.path.dirname(self.cache_path) or "."
+            os.makedirs(cache_dir, exist_ok=True)
+            try:
+                with open(self.cache_path) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = {}
+            cached[self.url] = self._products
+
+            # Replace the file atomically so concurrent runs never read a partial cache
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not write product cache {self.cache_path}: {e}")
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_product_index(url):
+    url = url.rstrip("/")
+    with _indexes_lock:
+        if url not in _indexes:
+            _indexes[url] = ProductIndex(url)
+        return _indexes[url]
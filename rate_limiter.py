@@ -0,0 +1,113 @@
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+
+from file_lock import FileLock
+
+# Requests per second allowed to ASoC across everything sharing the limiter;
+# 0 turns the bucket off and leaves only the 429/Retry-After handling
+RATE_LIMIT = float(os.environ.get("ASOC_RATE_LIMIT", "0"))
+RATE_BURST = float(os.environ.get("ASOC_RATE_BURST", "10"))
+# When set, the bucket lives in this file so all processes on the host share it
+STATE_FILE = os.environ.get("ASOC_RATE_LIMIT_FILE")
+
+MAX_RETRIES = int(os.environ.get("ASOC_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+RETRY_STATUSES = (429, 503)
+
+class RateLimiter:
+    # Token bucket refilled at rate per second up to burst. A throttled
+    # response pauses every caller until its Retry-After has passed, not only
+    # the one that got it.
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, state_file=STATE_FILE):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._state = {"tokens": self.burst, "updated": time.time(), "blocked_until": 0}
+
+    def acquire(self):
+        while True:
+            wait = self._update(self._take)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def block_for(self, seconds):
+        until = time.time() + seconds
+
+        def block(state, now):
+            state["blocked_until"] = max(state["blocked_until"], until)
+            return 0
+        self._update(block)
+
+    def _take(self, state, now):
+        # Seconds to wait before trying again, or 0 once a token was taken
+        if state["blocked_until"] > now:
+            # Spread out the callers released together when the block ends
+            return state["blocked_until"] - now + random.uniform(0, 1)
+        if self.rate <= 0:
+            return 0
+        state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * self.rate)
+        state["updated"] = now
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return 0
+        return (1 - state["tokens"]) / self.rate
+
+    def _update(self, change):
+        with self._lock:
+            if not self.state_file:
+                return change(self._state, time.time())
+            with FileLock(self.state_file + ".lock"):
+                state = self._read() or dict(self._state)
+                result = change(state, time.time())
+                self._write(state)
+                return result
+
+    def _read(self):
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, state):
+        # Only ever written under the file lock, so no temp file is needed
+        try:
+            with open(self.state_file, "w") as f:
+                json.dump(state, f)
+        except OSError as e:
+            print(f"Could not write rate limiter state {self.state_file}: {e}")
+
+def retry_delay(response, attempt):
+    # Retry-After (seconds or an HTTP date) when the server sent one,
+    # otherwise exponential backoff with full jitter
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        try:
+            return max(email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+def set_rate_limiter(limiter):
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
@@ -0,0 +1,37 @@
+import os
+
+# Sections of an ASoC security report, all off unless a profile turns them on
+REPORT_SECTIONS = (
+    "Summary", "Details", "Discussion", "Overview", "TableOfContent", "Advisories",
+    "FixRecommendation", "History", "Coverage", "MinimizeDetails", "Articles",
+)
+
+PROFILE_AUDIT = "audit"
+PROFILE_IMPORT = "import"
+PROFILE_SUMMARY = "summary"
+
+REPORT_PROFILES = {
+    # Everything, for reports people read; what generate_report always asked for
+    PROFILE_AUDIT: REPORT_SECTIONS,
+    # What the DefectDojo parser reads: the issues with their types, URLs,
+    # entities and fix recommendations, with the request/response details
+    # minimized
+    PROFILE_IMPORT: ("Details", "FixRecommendation", "MinimizeDetails"),
+    # Issue counts and the scan overview only
+    PROFILE_SUMMARY: ("Summary", "Overview"),
+}
+
+REPORT_PROFILE = os.environ.get("ASOC_REPORT_PROFILE", PROFILE_AUDIT)
+
+def report_configuration(profile=REPORT_PROFILE, file_type="XML"):
+    if profile not in REPORT_PROFILES:
+        raise ValueError(f"Unknown report profile {profile!r}, expected one of {', '.join(REPORT_PROFILES)}")
+    sections = REPORT_PROFILES[profile]
+    configuration = {name: name in sections for name in REPORT_SECTIONS}
+    configuration.update({
+        "ReportFileType": file_type,
+        "Title": "string",
+        "Notes": "string",
+        "Locale": "string",
+    })
+    return configuration
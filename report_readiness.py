@@ -0,0 +1,161 @@
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import requests
+
+from asoc_client import get_client
+
+DEFAULT_HISTORY_PATH = os.environ.get("ASOC_REPORT_HISTORY", os.path.expanduser("~/.cache/asoc/report_history.json"))
+# Seconds a report may take to become ready before giving up
+REPORT_TIMEOUT = float(os.environ.get("ASOC_REPORT_TIMEOUT", str(60 * 30)))
+
+MIN_INTERVAL = 1.0
+MAX_INTERVAL = 30.0
+# Samples kept per report profile
+HISTORY_SIZE = 200
+
+READY_STATUSES = ("Ready",)
+FAILED_STATUSES = ("Failed", "Error", "Aborted")
+
+class ReportHistory:
+    # Size and time-to-ready of past reports per profile, kept on disk, to
+    # estimate when the next report will be ready: the report size is
+    # expected to match the previous report for the same key (app), and the
+    # time comes from a least-squares fit of time over size.
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples = self._load()
+
+    def record(self, key, profile, size, seconds):
+        sample = {"key": key, "size": size, "seconds": round(seconds, 3), "time": time.time()}
+        with self._lock:
+            samples = self._samples.setdefault(profile or "", [])
+            samples.append(sample)
+            del samples[:-HISTORY_SIZE]
+            self._save(profile or "", sample)
+
+    def estimate(self, key, profile):
+        with self._lock:
+            samples = list(self._samples.get(profile or "", []))
+        if not samples:
+            return None
+
+        same_key = [s for s in samples if key is not None and s["key"] == key]
+        expected_size = same_key[-1]["size"] if same_key else statistics.median(s["size"] for s in samples)
+        sizes = [s["size"] for s in samples]
+        seconds = [s["seconds"] for s in samples]
+        if len(samples) < 2 or len(set(sizes)) < 2:
+            return statistics.median(seconds)
+        mean_size = statistics.fmean(sizes)
+        mean_seconds = statistics.fmean(seconds)
+        slope = sum((x - mean_size) * (y - mean_seconds) for x, y in zip(sizes, seconds)) / \
+            sum((x - mean_size) ** 2 for x in sizes)
+        return max(mean_seconds + slope * (expected_size - mean_size), 0)
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, profile, sample):
+        if not self.path:
+            return
+        try:
+            history_dir = os.path.dirname(self.path) or "."
+            os.makedirs(history_dir, exist_ok=True)
+            # Append to what is on disk, which other runs may have added to
+            stored = self._load()
+            samples = stored.setdefault(profile, [])
+            samples.append(sample)
+            del samples[:-HISTORY_SIZE]
+            fd, tmp_path = tempfile.mkstemp(dir=history_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write report history {self.path}: {e}")
+
+_use_head_probe = False
+
+def probe_report(token, report_id):
+    # Returns (status, progress) where status is "ready", "pending" or
+    # "failed", from the report's status resource; the body is never
+    # fetched. Falls back to a HEAD of the download URL where the status
+    # resource is not available.
+    global _use_head_probe
+    if not _use_head_probe:
+        response = get_client().get(f"Reports/{report_id}", token=token)
+        if response.status_code == 200:
+            report = response.json()
+            status = report.get("Status")
+            if status in READY_STATUSES:
+                return "ready", 100
+            if status in FAILED_STATUSES:
+                return "failed", report.get("Progress")
+            return "pending", report.get("Progress")
+        if response.status_code not in (404, 405):
+            response.raise_for_status()
+        _use_head_probe = True
+
+    response = get_client().request("HEAD", f"Reports/Download/{report_id}", token=token)
+    if response.status_code == 200:
+        return "ready", 100
+    if response.status_code == 404:
+        return "pending", None
+    response.raise_for_status()
+    return "pending", None
+
+def next_interval(elapsed, progress, eta, previous):
+    # The remaining time implied by progress or the history estimate when
+    # there is one, otherwise back off from the previous interval
+    if progress:
+        remaining = elapsed * (100 - progress) / progress
+    elif eta is not None and eta > elapsed:
+        remaining = eta - elapsed
+    else:
+        remaining = previous * 1.5
+    return min(max(remaining, MIN_INTERVAL), MAX_INTERVAL)
+
+def wait_for_report(token, report_id, key=None, profile=None, timeout=REPORT_TIMEOUT, history=None):
+    # Blocks until the report can be downloaded and returns the seconds it
+    # took; raises a RequestException if it failed or timed out
+    history = history or get_report_history()
+    eta = history.estimate(key, profile)
+    if eta is not None:
+        print(f"Report {report_id}: expected to be ready in about {eta:.0f}s")
+
+    start = time.monotonic()
+    interval = MIN_INTERVAL
+    # First look once most of the expected time has passed
+    if eta:
+        time.sleep(min(eta * 0.8, timeout))
+    while True:
+        status, progress = probe_report(token, report_id)
+        elapsed = time.monotonic() - start
+        if status == "ready":
+            return elapsed
+        if status == "failed":
+            raise requests.exceptions.RequestException(f"Report {report_id} generation failed")
+        if elapsed >= timeout:
+            raise requests.exceptions.Timeout(f"Report {report_id} not ready after {timeout:.0f}s")
+        interval = min(next_interval(elapsed, progress, eta, interval), timeout - elapsed)
+        time.sleep(interval)
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_report_history():
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = ReportHistory()
+        return _history
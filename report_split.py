@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+from appscan_report import start_tag
+
+ISSUE_GROUP = "issue-group"
+
+def split_report(path, max_issues=None, max_bytes=None, out_dir=None):
+    # Splits an AppScan XML report into sub-reports of at most max_issues
+    # issues and about max_bytes of issues each. Every sub-report keeps all
+    # the other groups (issue types, URLs, entities, scan information), so
+    # each is a valid report whose refs resolve on its own. Issues are
+    # streamed to a temporary file per chunk and the chunks assembled at the
+    # end, so memory holds only the other groups. Returns the sub-report
+    # paths, or [path] when the report fits in one chunk or is not XML.
+    if not max_issues and not max_bytes:
+        return [path]
+    out_dir = out_dir or os.path.dirname(path) or "."
+    root_tag = root_end = group_tag = None
+    # Serialized top-level elements in document order, None where the issues go
+    shared = []
+    bodies = []
+    stack = []
+    count = size = 0
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if not stack:
+                    root_tag = start_tag(elem)
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            elem.tail = None
+            if not stack:
+                root_end = f"</{elem.tag}>\n".encode()
+            elif len(stack) == 1:
+                if elem.tag == ISSUE_GROUP:
+                    group_tag = start_tag(elem)
+                    shared.append(None)
+                else:
+                    shared.append(ET.tostring(elem, encoding="unicode").encode() + b"\n")
+                stack[0].remove(elem)
+            elif len(stack) == 2 and stack[1].tag == ISSUE_GROUP:
+                data = ET.tostring(elem, encoding="unicode").encode() + b"\n"
+                if not bodies or (max_issues and count >= max_issues) or (max_bytes and count and size + len(data) > max_bytes):
+                    bodies.append(tempfile.TemporaryFile(dir=out_dir))
+                    count = size = 0
+                bodies[-1].write(data)
+                count += 1
+                size += len(data)
+                stack[1].remove(elem)
+    except ET.ParseError:
+        for body in bodies:
+            body.close()
+        return [path]
+
+    if len(bodies) < 2:
+        for body in bodies:
+            body.close()
+        return [path]
+
+    base, ext = os.path.splitext(os.path.basename(path))
+    paths = []
+    try:
+        for i, body in enumerate(bodies, 1):
+            chunk_path = os.path.join(out_dir, f"{base}.part{i}of{len(bodies)}{ext}")
+            with open(chunk_path, "wb") as out:
+                out.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+                out.write(root_tag)
+                for part in shared:
+                    if part is not None:
+                        out.write(part)
+                        continue
+                    out.write(group_tag)
+                    body.seek(0)
+                    shutil.copyfileobj(body, out)
+                    out.write(f"</{ISSUE_GROUP}>\n".encode())
+                out.write(root_end)
+            paths.append(chunk_path)
+    except OSError:
+        for chunk_path in paths:
+            os.remove(chunk_path)
+        raise
+    finally:
+        for body in bodies:
+            body.close()
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Split an AppScan XML report into smaller valid reports")
+    parser.add_argument("report", help="AppScan XML report")
+    parser.add_argument("--issues", type=int, help="Maximum issues per sub-report")
+    parser.add_argument("--mb", type=float, help="Approximate maximum megabytes of issues per sub-report")
+    parser.add_argument("--out-dir", help="Directory for the sub-reports (default: next to the report)")
+    args = parser.parse_args()
+    if not args.issues and not args.mb:
+        parser.error("one of --issues or --mb is required")
+
+    max_bytes = int(args.mb * 1024 * 1024) if args.mb else None
+    try:
+        paths = split_report(args.report, args.issues, max_bytes, args.out_dir)
+    except OSError as e:
+        print(f"Error splitting {args.report}: {e}")
+        sys.exit(1)
+    if paths == [args.report]:
+        print(f"{args.report} fits in one chunk, not split")
+        return
+    for path in paths:
+        print(f"{path}\t{os.path.getsize(path)} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# GET responses are served without a request for this many seconds (unless
+# the server sent its own max-age), then revalidated with If-None-Match or
+# If-Modified-Since when the server sent an ETag or Last-Modified
+FRESH_SECONDS = float(os.environ.get("DOJO_CACHE_TTL", "60"))
+MAX_ENTRIES = int(os.environ.get("DOJO_CACHE_ENTRIES", "512"))
+MAX_BYTES = int(float(os.environ.get("DOJO_CACHE_MB", "32")) * 1024 * 1024)
+# Optional on-disk tier shared by runs; off unless a directory is set
+DISK_DIR = os.environ.get("DOJO_RESPONSE_CACHE")
+DISK_MAX_BYTES = int(float(os.environ.get("DOJO_CACHE_DISK_MB", "256")) * 1024 * 1024)
+
+# Response headers kept with a cached body
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+class CachedResponse:
+    def __init__(self, url, headers, body, stored, max_age):
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.stored = stored
+        self.max_age = max_age
+
+    def fresh(self):
+        return time.time() - self.stored < self.max_age
+
+    def validators(self):
+        headers = {}
+        if self.headers.get("ETag"):
+            headers["If-None-Match"] = self.headers["ETag"]
+        if self.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = self.headers["Last-Modified"]
+        return headers
+
+    def response(self):
+        # A requests.Response as if the body had just been received
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.body
+        response.encoding = "utf-8"
+        return response
+
+    def to_json(self):
+        return {"url": self.url, "headers": self.headers, "stored": self.stored, "max_age": self.max_age}
+
+class ResponseCache:
+    # LRU cache of GET responses bounded by entry count and body bytes, with
+    # an optional on-disk tier. Keys cover the URL, the sorted query
+    # parameters and a hash of the token, since responses differ per user.
+    def __init__(self, fresh_seconds=FRESH_SECONDS, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, disk_dir=DISK_DIR,
+                 disk_max_bytes=DISK_MAX_BYTES):
+        self.fresh_seconds = fresh_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(url, params=None, token=None):
+        query = urllib.parse.urlencode(sorted((params or {}).items()), doseq=True)
+        user = hashlib.sha256(token.encode()).hexdigest()[:16] if token else ""
+        return f"{user}|{url}?{query}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._read_disk(key)
+        if entry is not None:
+            with self._lock:
+                self._insert(key, entry)
+        return entry
+
+    def store(self, key, response):
+        # Keeps a 200 response unless the server forbids it; returns the entry
+        cache_control = response.headers.get("Cache-Control", "")
+        if response.status_code != 200 or "no-store" in cache_control:
+            return None
+        match = re.search(r"max-age=(\d+)", cache_control)
+        max_age = float(match.group(1)) if match else self.fresh_seconds
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        entry = CachedResponse(response.url, headers, response.content, time.time(), max_age)
+        if len(entry.body) > self.max_bytes or (max_age <= 0 and not entry.validators()):
+            # Too big, or could never be served or revalidated
+            return None
+        with self._lock:
+            self._insert(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def refresh(self, key, entry, response):
+        # A 304: the body is still current, restart its freshness
+        for name in KEPT_HEADERS:
+            if name in response.headers:
+                entry.headers[name] = response.headers[name]
+        entry.stored = time.time()
+        self._write_disk(key, entry)
+
+    def invalidate(self, url_prefix):
+        # Drops every entry for URLs under url_prefix, e.g. after a POST to a collection
+        with self._lock:
+            for key in [k for k in self._entries if k.split("|", 1)[1].startswith(url_prefix)]:
+                self._bytes -= len(self._entries.pop(key).body)
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    with open(path) as f:
+                        meta = json.load(f)
+                    if meta["url"].startswith(url_prefix):
+                        self._remove_disk(path[:-len(".json")])
+                except (OSError, ValueError, KeyError):
+                    continue
+
+    def count(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+    def _insert(self, key, entry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous.body)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            with open(path + ".body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CachedResponse(meta["url"], meta["headers"], body, meta["stored"], meta["max_age"])
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            # Body first, so a metadata file always has its body
+            for suffix, data in ((".body", entry.body), (".json", json.dumps(entry.to_json()).encode())):
+                fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path + suffix)
+            self._trim_disk()
+        except OSError as e:
+            print(f"Could not write response cache {self.disk_dir}: {e}")
+
+    def _trim_disk(self):
+        # Oldest bodies go first once the directory is over its limit
+        bodies = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".body"):
+                stat = os.stat(os.path.join(self.disk_dir, name))
+                bodies.append((stat.st_mtime, stat.st_size, name[:-len(".body")]))
+        total = sum(size for _, size, _ in bodies)
+        for _, size, name in sorted(bodies):
+            if total <= self.disk_max_bytes:
+                break
+            self._remove_disk(os.path.join(self.disk_dir, name))
+            total -= size
+
+    def _remove_disk(self, path):
+        for suffix in (".json", ".body"):
+            try:
+                os.remove(path + suffix)
+            except OSError:
+                pass
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asoc_client import ASoCClient, set_client
+from batch_scan import continue_scan, new_record
+from dd1 import get_token
+from job_store import get_job_store
+from scan_poller import ScanPoller
+from scan_schedule import scan_timeout
+
+def resume_jobs(token, store, results_path, workers=10, max_time=None, poll_interval=30):
+    # Picks up every non-terminal job at its recorded phase; no new scans
+    # are started
+    jobs = store.pending()
+    records = []
+    if not jobs:
+        return records
+
+    poller = ScanPoller(token, interval=poll_interval, workers=workers)
+    with open(results_path, "a") as results, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for job in jobs:
+            record = new_record(job)
+            record["scan_id"] = job["scan_id"]
+            record["job_id"] = job["job_id"]
+            record["report_id"] = job["report_id"]
+            record["report_path"] = job["report_path"] or f"{job['scan_name']}_report.xml"
+            record["incremental"] = bool(job["incremental"])
+            record["scan_started"] = job["created"]
+            record["resumed"] = True
+            # Whatever is left of the original budget, but at least one status check
+            budget = max_time or scan_timeout(store, job["app_id"], record["incremental"])
+            timeout = max(job["created"] + budget - time.time(), 0) + poll_interval
+            print(f"[{job['scan_name']}] resuming scan {job['scan_id']} at phase {job['phase']}")
+            futures.append(pool.submit(continue_scan, token, record, poller, job["phase"], timeout, store))
+
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+
+    poller.stop()
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume interrupted AppScan DAST scan jobs from the job store")
+    parser.add_argument("api_key", help="ASoC API Key")
+    parser.add_argument("api_secret", help="ASoC API Secret")
+    parser.add_argument("--list", action="store_true", help="Only list the jobs that would be resumed")
+    parser.add_argument("--workers", type=int, default=10, help="Maximum number of jobs resumed at once")
+    parser.add_argument("--results", default="batch_results.jsonl", help="File the per-scan result records are appended to")
+    parser.add_argument("--timeout", type=int, help="Per-scan timeout in seconds, counted from the scan start "
+                        "(default: from the app's past scan durations, or 30 minutes without history)")
+    parser.add_argument("--poll-interval", type=int, default=30, help="Seconds between status checks")
+    args = parser.parse_args()
+
+    store = get_job_store()
+    if args.list:
+        for job in store.pending():
+            print(f"{job['job_id']}\t{job['scan_id']}\t{job['phase']}\t{job['app_id']}\t{job['scan_name']}\t{time.ctime(job['updated'])}")
+        return
+
+    set_client(ASoCClient(pool_size=args.workers))
+    token = get_token(args.api_key, args.api_secret)
+
+    records = resume_jobs(token, store, args.results, args.workers, args.timeout, args.poll_interval)
+    failed = [r for r in records if r["error"]]
+
+    print(f"{len(records)} jobs resumed, {len(failed)} failed. Results written to {args.results}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asoc_client import get_client
+from dd1 import get_scan_status, scan_status_from_json
+from metrics import get_metrics
+from scan_schedule import poll_delay
+
+TERMINAL_STATUSES = ("Completed", "Error")
+
+# Scans listing endpoint, queried with an OData $filter on the scan ids
+REST_SCANS_LIST = "Scans"
+# Answers meaning the API does not take the filter query; anything else
+# (5xx, 429, 401) fails only the current tick
+BULK_UNSUPPORTED_STATUSES = (400, 404, 405, 501)
+
+class ScanPoller:
+    # Tracks every active scan id and refreshes the ones that are due in one
+    # tick: one filtered Scans query per chunk of ids, or concurrent per-scan
+    # GETs if the API refuses the filter query. A scan added with an expected
+    # duration (eta) is checked rarely early on and often near the eta, see
+    # scan_schedule.poll_delay; others are checked every interval.
+    def __init__(self, token, interval=30, workers=10, chunk_size=50, bulk=True):
+        self.token = token
+        self.interval = interval
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.bulk = bulk
+        self.requests = 0
+        self._active = {}
+        self._added = {}
+        self._schedule = {}
+        # Scans a check has seen still running, so their completion is seen live
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, scan_id, callback=None, eta=None, started=None):
+        # callback(scan_id, status_obj) is called once the scan reaches a
+        # terminal status; started is when the scan was started, if earlier
+        # than now
+        now = time.time()
+        with self._lock:
+            callbacks = self._active.setdefault(scan_id, [])
+            self._added.setdefault(scan_id, now)
+            if scan_id not in self._schedule:
+                started = started or now
+                self._schedule[scan_id] = {"started": started, "eta": eta,
+                                           "due": started + poll_delay(now - started, eta, self.interval)}
+            if callback is not None:
+                callbacks.append(callback)
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name="scan-poller", daemon=True)
+                self._thread.start()
+            else:
+                self._wake.set()
+
+    def remove(self, scan_id, callback=None):
+        with self._lock:
+            callbacks = self._active.get(scan_id)
+            if callbacks is None:
+                return
+            if callback is not None and callback in callbacks:
+                callbacks.remove(callback)
+            if callback is None or not callbacks:
+                del self._active[scan_id]
+                self._schedule.pop(scan_id, None)
+                self._running.discard(scan_id)
+                # Given up on before it finished, e.g. a timeout
+                get_metrics().observe_phase("wait", time.time() - self._added.pop(scan_id), "error")
+
+    def wait(self, scan_id, timeout=None, eta=None, started=None):
+        # Block until the scan is terminal; returns None on timeout
+        done = threading.Event()
+        result = {}
+
+        def on_done(scan_id, status_obj):
+            result["status"] = status_obj
+            done.set()
+
+        self.add(scan_id, on_done, eta, started)
+        if not done.wait(timeout):
+            self.remove(scan_id, on_done)
+            return None
+        return result["status"]
+
+    def active(self):
+        with self._lock:
+            return list(self._active)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def due(self, now=None):
+        # Scans due within half an interval ride along in the same bulk
+        # query rather than costing a request of their own a moment later
+        until = (now or time.time()) + self.interval / 2
+        with self._lock:
+            return [scan_id for scan_id in self._active if self._schedule[scan_id]["due"] <= until]
+
+    def poll_once(self):
+        scan_ids = self.due()
+        if not scan_ids:
+            return {}
+
+        statuses = {}
+        failed = set()
+        if self.bulk:
+            bulk = self._fetch_bulk(scan_ids)
+            if bulk is None:
+                print("Bulk scan status query not available, falling back to per-scan requests")
+                self.bulk = False
+            else:
+                statuses.update(bulk[0])
+                failed = bulk[1]
+
+        # Scans whose bulk query failed are checked again on the next tick
+        missing = [scan_id for scan_id in scan_ids if scan_id not in statuses and scan_id not in failed]
+        if missing:
+            statuses.update(self._fetch_each(missing))
+
+        for scan_id, status_obj in statuses.items():
+            if status_obj["Status"] in TERMINAL_STATUSES:
+                self._complete(scan_id, status_obj)
+            else:
+                with self._lock:
+                    if scan_id in self._active:
+                        self._running.add(scan_id)
+        self._reschedule(scan_ids)
+        return statuses
+
+    def _reschedule(self, scan_ids):
+        now = time.time()
+        with self._lock:
+            for scan_id in scan_ids:
+                schedule = self._schedule.get(scan_id)
+                if schedule is not None and scan_id in self._active:
+                    schedule["due"] = now + poll_delay(now - schedule["started"], schedule["eta"], self.interval)
+
+    def _fetch_bulk(self, scan_ids):
+        # Returns the statuses found and the ids whose query failed, or None
+        # if the API does not support the filter query
+        statuses = {}
+        for i in range(0, len(scan_ids), self.chunk_size):
+            chunk = scan_ids[i:i + self.chunk_size]
+            query = " or ".join(f"Id eq '{scan_id}'" for scan_id in chunk)
+            self.requests += 1
+            try:
+                r = get_client().get(REST_SCANS_LIST, token=self.token, params={"$filter": query})
+            except Exception as e:
+                print(f"Error getting scan statuses: {e}")
+                return statuses, set(scan_ids[i:])
+            if r.status_code in BULK_UNSUPPORTED_STATUSES and not statuses:
+                return None
+            if r.status_code != 200:
+                print(f"Error getting scan statuses: status {r.status_code}, retrying next tick")
+                get_metrics().count_retry("asoc", "bulk_status")
+                return statuses, set(scan_ids[i:])
+
+            items = r.json()
+            if isinstance(items, dict):
+                items = items.get("Items", [])
+            for item in items:
+                if item.get("Id") in chunk:
+                    statuses[item["Id"]] = scan_status_from_json(item)
+        return statuses, set()
+
+    def _fetch_each(self, scan_ids):
+        self.requests += len(scan_ids)
+
+        def fetch(scan_id):
+            try:
+                return get_scan_status(self.token, scan_id)
+            except Exception as e:
+                print(f"Error getting scan status for {scan_id}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(scan_ids))) as pool:
+            results = pool.map(fetch, scan_ids)
+            return {scan_id: status_obj for scan_id, status_obj in zip(scan_ids, results) if status_obj is not None}
+
+    def _complete(self, scan_id, status_obj):
+        with self._lock:
+            callbacks = self._active.pop(scan_id, [])
+            added = self._added.pop(scan_id, None)
+            self._schedule.pop(scan_id, None)
+            seen_running = scan_id in self._running
+            self._running.discard(scan_id)
+        # Whether an earlier check saw the scan running, i.e. it completed while watched
+        status_obj = dict(status_obj, SeenRunning=seen_running)
+        if added is not None:
+            get_metrics().observe_phase("wait", time.time() - added, "ok" if status_obj["Status"] == "Completed" else "error")
+        for callback in callbacks:
+            try:
+                callback(scan_id, status_obj)
+            except Exception as e:
+                print(f"Error in completion callback for scan {scan_id}: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Error polling scan statuses: {e}")
+
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                # Sleep until the next scan is due or a new one is added
+                delay = min(schedule["due"] for schedule in self._schedule.values()) - time.time()
+            self._wake.wait(max(delay, 0))
+            self._wake.clear()
+
+        with self._lock:
+            self._thread = None
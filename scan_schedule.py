@@ -0,0 +1,56 @@
+import os
+import statistics
+import time
+
+# Durations needed before the history replaces the fixed defaults
+MIN_SAMPLES = 3
+# Per-app timeout: this percentile of past durations times TIMEOUT_FACTOR,
+# and at least TIMEOUT_MARGIN seconds beyond it
+TIMEOUT_PERCENTILE = 95
+TIMEOUT_FACTOR = 1.5
+TIMEOUT_MARGIN = 5 * 60
+DEFAULT_TIMEOUT = 60 * 30
+
+MIN_POLL_INTERVAL = float(os.environ.get("ASOC_MIN_POLL_INTERVAL", "5"))
+MAX_POLL_INTERVAL = float(os.environ.get("ASOC_MAX_POLL_INTERVAL", "300"))
+
+def expected_duration(store, app_id, incremental):
+    # Median of the app's recent scans of the same kind, or None without history
+    if store is None:
+        return None
+    durations = store.durations(app_id, incremental)
+    if len(durations) < MIN_SAMPLES:
+        return None
+    return statistics.median(durations)
+
+def scan_timeout(store, app_id, incremental, default=DEFAULT_TIMEOUT):
+    if store is None:
+        return default
+    durations = store.durations(app_id, incremental)
+    if len(durations) < MIN_SAMPLES:
+        return default
+    percentile = statistics.quantiles(durations, n=100, method="inclusive")[TIMEOUT_PERCENTILE - 1]
+    return max(percentile * TIMEOUT_FACTOR, percentile + TIMEOUT_MARGIN)
+
+def scan_duration(status_obj, started=None, live=False):
+    # Seconds a completed scan ran, for the duration history: ASoC's own
+    # execution duration when it reports one, else the time since started,
+    # but only if the completion was seen live. A scan found already
+    # complete, e.g. by resume.py hours later, would record the wait too.
+    if status_obj.get("Duration"):
+        return float(status_obj["Duration"])
+    if live and started:
+        return time.time() - started
+    return None
+
+def poll_delay(elapsed, eta, interval):
+    # Seconds until the next status check of a scan running for elapsed
+    # seconds. Without an ETA that is the plain interval. Before the ETA it
+    # halves the remaining time, so checks are sparse early and dense close
+    # to it; past the ETA they start dense and relax back to the interval.
+    if eta is None:
+        return interval
+    shortest = min(interval, MIN_POLL_INTERVAL)
+    if elapsed < eta:
+        return min(max((eta - elapsed) / 2, shortest), max(interval, MAX_POLL_INTERVAL))
+    return min(max((elapsed - eta) / 4, shortest), interval)
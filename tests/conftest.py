@@ -0,0 +1,54 @@
+import os
+import socket
+import sys
+import tempfile
+
+import pytest
+
+# The scripts live at the top of the repository and read the ASoC URL and
+# their cache paths from the environment on import, so point those at the
+# mock server's port and a scratch directory before any of them is imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+with socket.socket() as _sock:
+    _sock.bind(("127.0.0.1", 0))
+    MOCK_PORT = _sock.getsockname()[1]
+os.environ["ASOC_BASE_URL"] = f"http://127.0.0.1:{MOCK_PORT}/api/v2"
+_cache_dir = tempfile.mkdtemp(prefix="asoc_tests_")
+for _name, _file in (("ASOC_TOKEN_CACHE", "token.json"), ("ASOC_JOB_STORE", "jobs.sqlite3"),
+                     ("ASOC_REPORT_HISTORY", "report_history.json"), ("DOJO_PRODUCT_CACHE", "products.json"),
+                     ("DOJO_IMPORT_CACHE", "imports.json"), ("DOJO_FINDING_INDEX", "findings.sqlite3")):
+    os.environ[_name] = os.path.join(_cache_dir, _file)
+
+import dojo_client
+import product_index
+from asoc_client import ASoCClient, get_client, set_client
+from mock_services import MockServer
+from rate_limiter import RateLimiter, get_rate_limiter, set_rate_limiter
+
+@pytest.fixture
+def mock_server():
+    server = MockServer(port=MOCK_PORT).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    # Every test gets a new server on the same port: drop the pooled
+    # connections to this one and the product ids it handed out
+    with dojo_client._clients_lock:
+        for client in dojo_client._clients.values():
+            client.close()
+        dojo_client._clients.clear()
+    with product_index._indexes_lock:
+        product_index._indexes.clear()
+    if os.path.exists(os.environ["DOJO_PRODUCT_CACHE"]):
+        os.remove(os.environ["DOJO_PRODUCT_CACHE"])
+
+@pytest.fixture
+def asoc(mock_server):
+    # The shared ASoC client and rate limiter, pointed at the mock server
+    previous = get_client(), get_rate_limiter()
+    set_client(ASoCClient())
+    set_rate_limiter(RateLimiter(rate=0))
+    yield mock_server
+    get_client().close()
+    set_client(previous[0])
+    set_rate_limiter(previous[1])
@@ -0,0 +1,21 @@
+from appscan_report import iter_findings
+
+REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<xml-report>
+<issue-type-group><item id="7"><name>XSS</name><cwe>79</cwe></item></issue-type-group>
+<url-group><item id="7"><name>https://example.com/search</name></item></url-group>
+<entity-group><item id="7"><name>q</name><entity-type>Parameter</entity-type></item></entity-group>
+<issue-group>
+<item id="issue1"><issue-type><ref>7</ref></issue-type><severity>High</severity>
+<url><ref>7</ref></url><entity><ref>7</ref></entity></item>
+</issue-group>
+</xml-report>
+"""
+
+def test_refs_resolve_in_their_own_group(tmp_path):
+    # The same id in every group: each field still gets its own group's item
+    path = tmp_path / "report.xml"
+    path.write_text(REPORT)
+    [finding] = iter_findings(str(path))
+    assert finding == {"id": "issue1", "issue_type": "XSS", "severity": "High", "url": "https://example.com/search",
+                       "parameter": "q", "cwe": "79", "entity": "q"}
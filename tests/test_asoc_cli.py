@@ -0,0 +1,21 @@
+import pytest
+
+from asoc import build_parser, main
+from bench_report_parser import write_synthetic_report
+from dd1 import run_single_scan
+
+def test_unknown_profile_is_rejected_when_parsing():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["scan", "key", "secret", "app", "https://example.com", "nightly", "--report-profile", "audi"])
+
+def test_unknown_profile_fails_before_the_scan_starts(asoc):
+    with pytest.raises(ValueError):
+        run_single_scan("token", "app", "https://example.com", "nightly", report_profile="audi")
+    assert asoc.state.scans == {}
+
+def test_import_keeps_braces_in_names(mock_server, tmp_path):
+    path = str(tmp_path / "nightly_report.xml")
+    write_synthetic_report(path, 0.1, urls=5)
+    main(["import", mock_server.url, "token", "Shop {eu}", "Release {2}", path, "--force"])
+    assert list(mock_server.state.products) == ["Shop {eu}"]
+    assert mock_server.state.stats()["imports"] == 1
@@ -0,0 +1,52 @@
+import hashlib
+
+import pytest
+
+from dd1 import download_report_to_file, generate_report, get_token
+
+def _report(server):
+    token = get_token("key", "secret")
+    server.state.scans["scan1"] = 0
+    return token, generate_report(token, "scan1")["Id"]
+
+def _expected(server, report_id):
+    with open(server.report_file(server.state.reports[report_id][1]), "rb") as f:
+        return f.read()
+
+@pytest.mark.parametrize("gzip_downloads", [False, True])
+def test_download_matches_report(asoc, tmp_path, gzip_downloads):
+    asoc.gzip_downloads = gzip_downloads
+    token, report_id = _report(asoc)
+    path = str(tmp_path / "report.xml")
+    report = download_report_to_file(token, report_id, path)
+
+    expected = _expected(asoc, report_id)
+    with open(path, "rb") as f:
+        assert f.read() == expected
+    assert report["size"] == len(expected)
+    assert report["sha256"] == hashlib.sha256(expected).hexdigest()
+
+@pytest.mark.parametrize("gzip_downloads", [False, True])
+def test_dropped_download_resumes_with_range(asoc, tmp_path, gzip_downloads):
+    asoc.gzip_downloads = gzip_downloads
+    asoc.drop_downloads = 2
+    token, report_id = _report(asoc)
+    path = str(tmp_path / "report.xml")
+    report = download_report_to_file(token, report_id, path)
+
+    expected = _expected(asoc, report_id)
+    with open(path, "rb") as f:
+        assert f.read() == expected
+    assert report["sha256"] == hashlib.sha256(expected).hexdigest()
+    # The first attempt and two resumes, the last one completing the report
+    assert asoc.state.requests["download_report"] == 3
+    assert not (tmp_path / "report.xml.part").exists()
+
+def test_incomplete_download_fails_after_max_resumes(asoc, tmp_path):
+    asoc.drop_downloads = 10
+    token, report_id = _report(asoc)
+    path = str(tmp_path / "report.xml")
+    with pytest.raises(SystemExit):
+        download_report_to_file(token, report_id, path, max_resumes=2)
+    assert not (tmp_path / "report.xml").exists()
+    assert not (tmp_path / "report.xml.part").exists()
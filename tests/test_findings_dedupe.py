@@ -0,0 +1,30 @@
+import time
+
+from findings_dedupe import FindingIndex, dedupe_scope
+
+def test_uploaded_findings_expire(tmp_path):
+    index = FindingIndex(str(tmp_path / "findings.sqlite3"), ttl=60)
+    scope = dedupe_scope("product", "http://dojo", "p1")
+    claimed = index.claim(scope, ["a", "b"])
+    index.commit(scope, claimed)
+    assert index.claim(scope, ["a", "b", "c"]) == {"c"}
+    index.release(scope, {"c"})
+
+    # A closed finding that shows up again once its entry has expired is uploaded again
+    conn = index._connect()
+    with conn:
+        conn.execute("UPDATE findings SET first_seen = ? WHERE fingerprint = 'a'", (time.time() - 120,))
+    conn.close()
+    assert index.claim(scope, ["a", "b"]) == {"a"}
+
+def test_reset_forgets_instance_or_product(tmp_path):
+    index = FindingIndex(str(tmp_path / "findings.sqlite3"))
+    for scope in (dedupe_scope("product", "http://dojo", "p1"), dedupe_scope("product", "http://dojo", "p2"),
+                  dedupe_scope("global", "http://dojo", None), dedupe_scope("global", "http://other", None)):
+        index.commit(scope, {"a"})
+
+    assert index.reset(dedupe_scope("product", "http://dojo", "p1")) == 1
+    assert index.claim(dedupe_scope("product", "http://dojo", "p1"), ["a"]) == {"a"}
+    assert index.reset("http://dojo") == 2
+    assert index.claim("http://dojo", ["a"]) == {"a"}
+    assert index.claim("http://other", ["a"]) == set()
@@ -0,0 +1,34 @@
+import sqlite3
+
+from job_store import PHASE_DOWNLOADING, PHASE_DONE, PHASE_POLLING, JobStore
+
+def test_incremental_execution_keeps_baseline_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    baseline = store.add("scan1", "app1", "https://example.com", "full", "full.xml")
+    store.update(baseline, PHASE_DOWNLOADING, report_id="report1")
+
+    incremental = store.add("scan1", "app1", "https://example.com", "incr", "incr.xml", incremental=True)
+    assert incremental != baseline
+    assert store.get(baseline)["phase"] == PHASE_DOWNLOADING
+    assert store.get(baseline)["report_id"] == "report1"
+
+    store.update(incremental, PHASE_DONE)
+    pending = store.pending()
+    assert [job["job_id"] for job in pending] == [baseline]
+    assert store.get(incremental)["phase"] == PHASE_DONE
+
+def test_store_keyed_on_scan_id_is_migrated(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (scan_id TEXT PRIMARY KEY, app_id TEXT NOT NULL, target_url TEXT, scan_name TEXT NOT NULL, "
+                 "phase TEXT NOT NULL, report_id TEXT, report_path TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)")
+    conn.execute("INSERT INTO jobs VALUES ('scan1', 'app1', NULL, 'old', 'downloading', 'report1', 'old.xml', NULL, 1, 1)")
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    [job] = store.pending()
+    assert (job["scan_id"], job["report_id"], job["incremental"]) == ("scan1", "report1", 0)
+    new = store.add("scan1", "app1", None, "new", incremental=True)
+    assert store.get(new)["phase"] == PHASE_POLLING
+    assert len(store.all()) == 2
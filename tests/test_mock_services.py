@@ -0,0 +1,12 @@
+import requests
+
+AUTH = {"Authorization": "Token test"}
+
+def test_error_replies_do_not_deadlock(mock_server):
+    # Each of these answered while holding the state lock that sending takes
+    url = f"{mock_server.url}/api/v2"
+    assert requests.post(f"{url}/products/", json={"name": "p1"}, headers=AUTH, timeout=5).status_code == 201
+    assert requests.post(f"{url}/products/", json={"name": "p1"}, headers=AUTH, timeout=5).status_code == 400
+    assert requests.post(f"{url}/Scans/missing/Executions", json={}, headers=AUTH, timeout=5).status_code == 404
+    assert requests.post(f"{url}/Reports/Security/Scan/missing", json={}, headers=AUTH, timeout=5).status_code == 404
+    assert requests.get(f"{mock_server.url}/_mock/stats", timeout=5).json()["products"] == 1
@@ -0,0 +1,19 @@
+import asyncio
+
+from dd1 import get_token
+from job_store import PHASE_DONE, get_job_store
+from pipeline import Pipeline
+
+def test_pipeline_records_jobs_for_resume(asoc, tmp_path):
+    token = get_token("key", "secret")
+    pipeline = Pipeline(token, asoc.url, "dojo-token", str(tmp_path), poll_interval=1, keep_reports=True, skip_unchanged=False)
+    jobs = [{"app_id": "app1", "target_url": "https://app1.example.com", "scan_name": "pipe1", "product": "p1", "engagement": "e1"}]
+    [record] = asyncio.run(pipeline.run(jobs))
+
+    assert record["error"] is None
+    assert record["import_status"] == 201
+    job = get_job_store().get(record["job_id"])
+    assert job["scan_id"] == record["scan_id"]
+    assert job["phase"] == PHASE_DONE
+    assert job["report_id"] == record["report_id"]
+    assert job["report_path"] == str(tmp_path / "pipe1_report.xml")
@@ -0,0 +1,66 @@
+import email.utils
+import time
+
+import requests
+
+import asoc_client
+import rate_limiter
+from asoc_client import get_client
+from rate_limiter import RateLimiter, retry_delay
+
+def _response(retry_after=None):
+    response = requests.Response()
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+def test_retry_delay_follows_retry_after():
+    assert retry_delay(_response("7"), 0) == 7
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= retry_delay(_response(date), 0) <= 30
+    # No Retry-After: jittered exponential backoff, capped
+    assert all(0 <= retry_delay(_response(), 3) <= 8 for _ in range(100))
+    assert all(0 <= retry_delay(None, 20) <= rate_limiter.BACKOFF_CAP for _ in range(100))
+
+def test_bucket_limits_rate():
+    limiter = RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.45
+
+def test_bucket_shared_through_state_file(tmp_path):
+    # Two limiters standing in for two processes on the same host
+    state_file = str(tmp_path / "limiter.json")
+    limiters = [RateLimiter(rate=10, burst=1, state_file=state_file) for _ in range(2)]
+    start = time.monotonic()
+    for i in range(10):
+        limiters[i % 2].acquire()
+    assert time.monotonic() - start >= 0.8
+
+def test_block_holds_back_every_caller():
+    limiter = RateLimiter(rate=0)
+    limiter.block_for(0.5)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.5
+
+def test_throttled_calls_wait_for_retry_after(asoc):
+    asoc.state.scans["scan1"] = 0
+    asoc.rate_limit = 2
+    token = "token"
+    start = time.monotonic()
+    statuses = [get_client().get("Scans/DynamicAnalyzer/scan1", token=token).status_code for _ in range(5)]
+    assert statuses == [200] * 5
+    assert asoc.state.throttled >= 1
+    # The mock asks for Retry-After: 1 once a second has more than 2 calls
+    assert time.monotonic() - start >= 1
+
+def test_retries_stop_after_max_retries(asoc, monkeypatch):
+    monkeypatch.setattr(asoc_client, "MAX_RETRIES", 2)
+    monkeypatch.setattr(rate_limiter, "BACKOFF_CAP", 0.01)
+    asoc.error_rate = 1.0
+    asoc.error_status = 503
+    response = get_client().get("Scans/DynamicAnalyzer/scan1", token="token")
+    assert response.status_code == 503
+    assert asoc.state.errors == 3
@@ -0,0 +1,85 @@
+import os
+
+import defectdojo
+import dojo_client
+from appscan_report import iter_findings
+from bench_report_parser import write_synthetic_report
+from defectdojo import import_scan_chunked
+from report_split import split_report
+
+def _findings(paths):
+    return sorted((f for path in paths for f in iter_findings(path)), key=lambda f: f["id"])
+
+def test_split_keeps_every_finding(tmp_path):
+    path = str(tmp_path / "report.xml")
+    issues = write_synthetic_report(path, 0.5, urls=20)
+    os.mkdir(tmp_path / "chunks")
+    chunks = split_report(path, max_issues=50, out_dir=str(tmp_path / "chunks"))
+
+    assert len(chunks) == -(-issues // 50)
+    assert all(len(list(iter_findings(chunk))) <= 50 for chunk in chunks)
+    # Every chunk resolves its refs on its own, so the findings come out the same
+    assert _findings(chunks) == _findings([path])
+
+def test_split_by_size(tmp_path):
+    path = str(tmp_path / "report.xml")
+    write_synthetic_report(path, 1, urls=20)
+    chunks = split_report(path, max_bytes=200 * 1024)
+    assert len(chunks) > 1
+    assert _findings(chunks) == _findings([path])
+    for chunk in chunks:
+        os.remove(chunk)
+
+def test_report_within_limits_is_not_split(tmp_path):
+    path = str(tmp_path / "report.xml")
+    issues = write_synthetic_report(path, 0.1, urls=20)
+    assert split_report(path, max_issues=issues) == [path]
+    assert split_report(path) == [path]
+    assert os.listdir(tmp_path) == ["report.xml"]
+
+def test_chunked_import_retries_failed_chunks(mock_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(defectdojo, "retry_delay", lambda response, attempt: 0)
+    path = str(tmp_path / "report.xml")
+    issues = write_synthetic_report(path, 0.5, urls=20)
+    mock_server.fail_requests = 3
+    mock_server.fail_endpoint = "reimport_scan"
+
+    response = import_scan_chunked("token", 1, 1, path, mock_server.url, "HCLAppScan XML DAST", max_issues=50, retries=3)
+    assert response.status_code == 201
+    stats = mock_server.state.stats()
+    assert stats["imports"] == 1
+    assert stats["reimports"] == -(-issues // 50) - 1
+    assert stats["errors"] == 3
+    # The chunk files are removed, the report is left alone
+    assert os.listdir(tmp_path) == ["report.xml"]
+
+def _chunked_import(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(defectdojo, "retry_delay", lambda response, attempt: 0)
+    monkeypatch.setattr(defectdojo, "CREATED_TEST_WAIT", 0.4)
+    # A read timeout well below the stalled import
+    dojo_client._clients[server.url] = dojo_client.DojoClient(server.url, timeout=(5, 0.5))
+    path = str(tmp_path / "report.xml")
+    chunks = -(-write_synthetic_report(path, 0.5, urls=20) // 50)
+    response = import_scan_chunked("token", 1, 7, path, server.url, "HCLAppScan XML DAST", max_issues=50, retries=3)
+    return response, chunks
+
+def test_timed_out_first_chunk_is_reimported_into_its_test(mock_server, tmp_path, monkeypatch):
+    mock_server.stall_imports = 1
+    mock_server.stall_seconds = 1.0
+    response, chunks = _chunked_import(mock_server, tmp_path, monkeypatch)
+
+    assert response.status_code == 201
+    # One test, holding every chunk: the first through a reimport after the timeout
+    assert list(mock_server.state.tests) == [1]
+    assert mock_server.state.tests[1]["engagement"] == 7
+    assert mock_server.state.tests[1]["reimports"] == chunks
+
+def test_failed_first_chunk_without_test_is_imported_again(mock_server, tmp_path, monkeypatch):
+    mock_server.fail_requests = 1
+    mock_server.fail_endpoint = "import_scan"
+    response, chunks = _chunked_import(mock_server, tmp_path, monkeypatch)
+
+    assert response.status_code == 201
+    assert mock_server.state.errors == 1
+    assert list(mock_server.state.tests) == [1]
+    assert mock_server.state.tests[1]["reimports"] == chunks - 1
@@ -0,0 +1,33 @@
+import time
+
+from scan_poller import ScanPoller
+
+def _poller(server):
+    server.state.scans["scan1"] = time.time()
+    poller = ScanPoller("token", interval=30)
+    # Stopped first so ticks only run when the test calls poll_once
+    poller.stop()
+    poller.add("scan1", started=time.time() - 100)
+    return poller
+
+def _due_now(poller):
+    poller._schedule["scan1"]["due"] = 0
+
+def test_failed_bulk_query_is_retried_next_tick(asoc):
+    poller = _poller(asoc)
+    asoc.fail_requests = 1
+    assert poller.poll_once() == {}
+    assert poller.bulk
+
+    _due_now(poller)
+    assert "scan1" in poller.poll_once()
+    assert asoc.state.requests["scan_list"] == 2
+    assert "scan_status" not in asoc.state.requests
+
+def test_unsupported_bulk_query_falls_back_to_per_scan(asoc):
+    poller = _poller(asoc)
+    asoc.fail_requests = 1
+    asoc.error_status = 404
+    assert "scan1" in poller.poll_once()
+    assert not poller.bulk
+    assert asoc.state.requests["scan_status"] == 1
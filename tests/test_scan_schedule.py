@@ -0,0 +1,44 @@
+import time
+
+from dd1 import get_token
+from job_store import JobStore
+from resume import resume_jobs
+from scan_poller import ScanPoller
+from scan_schedule import scan_duration
+
+def test_scan_duration():
+    assert scan_duration({"Duration": 600}, time.time() - 7200) == 600
+    # Without ASoC's duration, the time since the start only counts when seen live
+    assert scan_duration({"Duration": None}, time.time() - 7200) is None
+    assert 7199 < scan_duration({"Duration": None}, time.time() - 7200, live=True) < 7300
+
+def test_poller_flags_completion_seen_live(asoc):
+    asoc.scan_seconds = 1.5
+    asoc.state.scans["live"] = time.time()
+    asoc.state.scans["done"] = time.time() - 60
+    poller = ScanPoller("token", interval=0.5)
+    statuses = [poller.wait(scan_id, timeout=10) for scan_id in ("live", "done")]
+    poller.stop()
+    assert [status["SeenRunning"] for status in statuses] == [True, False]
+
+def _resume_finished_scan(asoc, tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    asoc.state.scans["scan1"] = time.time() - 7200
+    store.add("scan1", "app1", "https://app1.example.com", "resumed", str(tmp_path / "resumed_report.xml"))
+    conn = store._connect()
+    with conn:
+        conn.execute("UPDATE jobs SET created = ?", (time.time() - 7200,))
+    conn.close()
+    [record] = resume_jobs(get_token("key", "secret"), store, str(tmp_path / "results.jsonl"), poll_interval=1)
+    assert record["error"] is None
+    return store
+
+def test_resume_records_execution_duration(asoc, tmp_path):
+    store = _resume_finished_scan(asoc, tmp_path)
+    assert store.durations("app1", False) == [asoc.scan_seconds]
+
+def test_resume_without_execution_duration_records_nothing(asoc, tmp_path):
+    # A zero ExecutionDurationSec counts as not reported
+    asoc.scan_seconds = 0
+    store = _resume_finished_scan(asoc, tmp_path)
+    assert store.durations("app1", False) == []
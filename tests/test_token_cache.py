@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import threading
+
+from asoc_client import get_client
+from token_cache import TokenCache, get_cached_token
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_threads_share_one_login(asoc, tmp_path):
+    cache = TokenCache("key", "secret", path=str(tmp_path / "token.json"))
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(cache.get())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(tokens)) == 1
+    assert asoc.state.logins == 1
+
+def test_processes_share_one_login(asoc, tmp_path):
+    # Each process has its own TokenCache; only the file lock keeps them
+    # from logging in at the same time
+    path = str(tmp_path / "token.json")
+    script = (f"import sys; sys.path.insert(0, {ROOT!r}); from token_cache import TokenCache; "
+              f"print(TokenCache('key', 'secret', path={path!r}).get())")
+    processes = [subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, text=True) for _ in range(4)]
+    tokens = {process.communicate(timeout=60)[0].strip() for process in processes}
+    assert len(tokens) == 1
+    assert asoc.state.logins == 1
+    # A new instance in this process reads the token from disk
+    assert TokenCache("key", "secret", path=path).get() == tokens.pop()
+    assert asoc.state.logins == 1
+
+def test_unauthorized_refreshes_token_once(asoc):
+    asoc.state.scans["scan1"] = 0
+    token = get_cached_token("refresh-key", "secret")
+    asoc.state.revoked.add(token)
+    response = get_client().get("Scans/DynamicAnalyzer/scan1", token=token)
+    assert response.status_code == 200
+    assert asoc.state.logins == 2
+
+    # The replacement keeps being used, without another login
+    assert get_client().get("Scans/DynamicAnalyzer/scan1", token=token).status_code == 200
+    assert asoc.state.logins == 2
+
+def test_unauthorized_after_refresh_is_returned(asoc):
+    asoc.state.scans["scan1"] = 0
+    token = get_cached_token("reject-key", "secret")
+    asoc.reject_tokens = True
+    response = get_client().get("Scans/DynamicAnalyzer/scan1", token=token)
+    assert response.status_code == 401
+    assert asoc.state.logins == 2
+    assert asoc.state.requests["scan_status"] == 2
@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from asoc_client import get_client, set_token_provider
+from file_lock import FileLock
+from metrics import phase
+
+DEFAULT_CACHE_PATH = os.environ.get("ASOC_TOKEN_CACHE", os.path.expanduser("~/.cache/asoc/token.json"))
+# Refresh this many seconds before the token expires
+REFRESH_MARGIN = int(os.environ.get("ASOC_TOKEN_REFRESH_MARGIN", "300"))
+# Lifetime assumed when the login response carries no expiry
+DEFAULT_LIFETIME = 60 * 30
+
+REST_APIKEYLOGIN = "Account/ApiKeyLogin"
+
+class TokenCache:
+    # Bearer token for one API key, stored on disk with its expiry so that
+    # concurrent processes log in once and share the token. Reads and
+    # refreshes of the cache file happen under a file lock.
+    def __init__(self, api_key, api_secret, login_url=REST_APIKEYLOGIN, path=DEFAULT_CACHE_PATH, margin=REFRESH_MARGIN):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.login_url = login_url
+        self.path = path
+        self.margin = margin
+        self.key = hashlib.sha256(f"{api_key}:{api_secret}".encode()).hexdigest()
+        self.logins = 0
+        self._token = None
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    def get(self, stale_token=None):
+        # stale_token is a token the server rejected; never hand it out again
+        with self._lock:
+            if self._valid(self._token, self._expires, stale_token):
+                return self._token
+
+            with FileLock(self.path + ".lock"):
+                entry = self._read()
+                if entry is not None and self._valid(entry["Token"], entry["Expires"], stale_token):
+                    self._token, self._expires = entry["Token"], entry["Expires"]
+                else:
+                    self._token, self._expires = self._login()
+                    self._write()
+            return self._token
+
+    def _valid(self, token, expires, stale_token):
+        return token is not None and token != stale_token and expires - self.margin > time.time()
+
+    @phase("login")
+    def _login(self):
+        self.logins += 1
+        json_data = {"KeyId": self.api_key, "KeySecret": self.api_secret}
+        response = get_client().post(self.login_url, json=json_data)
+        response.raise_for_status()
+        json_data = json.loads(response.text)
+        return json_data['Token'], _parse_expiry(json_data.get('Expire'))
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f).get(self.key)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self):
+        cache_dir = os.path.dirname(self.path) or "."
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = {}
+        now = time.time()
+        cached = {key: entry for key, entry in cached.items() if entry.get("Expires", 0) > now}
+        cached[self.key] = {"Token": self._token, "Expires": self._expires}
+
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cached, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+def _parse_expiry(expire):
+    if expire:
+        try:
+            return datetime.datetime.fromisoformat(expire.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return time.time() + DEFAULT_LIFETIME
+
+class _TokenProvider:
+    # Hooked into ASoCClient: swaps tokens issued by a TokenCache for a fresh
+    # one shortly before they expire, and after a 401
+    def __init__(self):
+        self.caches = {}
+        self.issued = {}
+        self.lock = threading.Lock()
+
+    def current(self, token):
+        cache = self.issued.get(token)
+        return self.issue(cache, cache.get()) if cache is not None else token
+
+    def refresh(self, token):
+        cache = self.issued.get(token)
+        return self.issue(cache, cache.get(stale_token=token)) if cache is not None else None
+
+    def issue(self, cache, token):
+        with self.lock:
+            self.issued[token] = cache
+        return token
+
+_provider = _TokenProvider()
+set_token_provider(_provider)
+
+def get_cached_token(api_key, api_secret, login_url=REST_APIKEYLOGIN):
+    with _provider.lock:
+        cache = _provider.caches.get((api_key, api_secret))
+        if cache is None:
+            cache = _provider.caches[(api_key, api_secret)] = TokenCache(api_key, api_secret, login_url)
+    return _provider.issue(cache, cache.get())